@@ -1,136 +1,1567 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, has_request_context, request, jsonify, send_file, stream_with_context
 from flask_cors import CORS
 import pyproj
 import json
+import numpy as np
+import shapely
 from shapely.geometry import shape, mapping
-from shapely.ops import transform
 import logging
+import codecs
+import re
+import gzip
+import struct
+import zlib
+from itertools import chain, islice
+import os
+import threading
+import shutil
+import tempfile
+import time
+import socket
+import uuid
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+
+# Bibliothèque JSON rapide si elle est installée, sinon la bibliothèque standard
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 app = Flask(__name__)
 CORS(app)  # Permet les requêtes CORS
 
-# Configurer le logging
-logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
+# Configurer le logging (niveau défini par la variable d'environnement LOG_LEVEL)
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO").upper()
+logging.basicConfig(level=LOG_LEVEL, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-# Fonction pour convertir les coordonnées de UTM à WGS84 avec un code EPSG spécifique
-def convert_utm_to_wgs84(geometry, epsg_code):
+# Configuration des formats de transport et de la compression
+WKB_BATCH_MIMETYPE = 'application/x-wkb-batch'
+GZIP_MIN_SIZE = int(os.environ.get("GZIP_MIN_SIZE", "1024"))
+GZIP_LEVEL = int(os.environ.get("GZIP_LEVEL", "6"))
+MAX_DECOMPRESSED_SIZE = int(os.environ.get("MAX_DECOMPRESSED_SIZE", str(1024 ** 3)))
+
+# Configuration des tâches de conversion asynchrones
+JOBS_DIR = os.environ.get("JOBS_DIR", os.path.join(tempfile.gettempdir(), "convert_jobs"))
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", "2"))
+JOB_BATCH_SIZE = int(os.environ.get("JOB_BATCH_SIZE", "5000"))
+JOB_HEARTBEAT_SECONDS = float(os.environ.get("JOB_HEARTBEAT_SECONDS", "15"))
+JOB_STALE_SECONDS = float(os.environ.get("JOB_STALE_SECONDS", "120"))
+JOB_TTL_SECONDS = float(os.environ.get("JOB_TTL_SECONDS", str(24 * 3600)))
+
+# Précision par défaut des coordonnées en sortie (nombre de décimales, vide = aucune)
+COORDINATE_PRECISION = os.environ.get("COORDINATE_PRECISION", "")
+COORDINATE_PRECISION = int(COORDINATE_PRECISION) if COORDINATE_PRECISION else None
+
+# Couche de codec JSON : lecture des requêtes et rendu des réponses.
+# orjson convertit en flottant (avec perte) les entiers hors de la plage
+# 64 bits et refuse de les écrire : ces documents, repérés par une suite d'au
+# moins 19 chiffres, passent par la bibliothèque standard, qui reste exacte.
+# NaN et Infinity sont refusés dans les deux cas, comme le fait orjson.
+_LONG_DIGITS = re.compile(rb'\d{19}')
+
+def _reject_constant(name):
+    raise ValueError(f"Valeur JSON invalide: {name}")
+
+def json_loads(data):
+    if orjson is not None and not _LONG_DIGITS.search(data):
+        return orjson.loads(data)
+    return json.loads(data, parse_constant=_reject_constant)
+
+def json_dumps(obj):
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj)
+        except TypeError:
+            pass
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+# Lecture du corps de la requête, décompressé si Content-Encoding: gzip.
+# La taille décompressée est bornée pour se protéger des bombes gzip.
+def read_request_body():
+    data = request.get_data(cache=False)
+    if request.content_encoding == 'gzip' and data:
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        try:
+            data = decompressor.decompress(data, MAX_DECOMPRESSED_SIZE)
+        except zlib.error as e:
+            raise ValueError(f"Corps gzip invalide: {e}")
+        if decompressor.unconsumed_tail:
+            raise ValueError("Corps décompressé trop volumineux.")
+    return data
+
+def parse_request_json():
+    with stage('parse'):
+        data = read_request_body()
+        if not data:
+            return {}
+        return json_loads(data)
+
+def render_json(obj, status=200, mimetype='application/json'):
+    with stage('serialize'):
+        body = json_dumps(obj)
+    return Response(body, status=status, mimetype=mimetype)
+
+# Précision demandée par le client, ou celle configurée par défaut
+def get_precision(value):
+    if value is None or value == '':
+        return COORDINATE_PRECISION
+    if isinstance(value, (bool, float)):
+        raise ValueError(f"precision doit être un entier (reçu: {value!r}).")
+    precision = int(value)
+    if not 0 <= precision <= 15:
+        raise ValueError("precision doit être comprise entre 0 et 15.")
+    return precision
+
+# Instrumentation par étape : chaque requête accumule la durée de ses étapes
+# (parse, shape, transform, mapping, serialize, compress...) dans flask.g.
+# Elles sont renvoyées dans l'en-tête Server-Timing et agrégées pour /metrics.
+# Hors contexte de requête (workers du pool, tâches), stage() ne mesure rien.
+METRICS_WINDOW = int(os.environ.get("METRICS_WINDOW", "1000"))
+
+class PipelineMetrics:
+    def __init__(self, window=1000):
+        self.window = window
+        self._lock = threading.Lock()
+        self._requests = {}
+        self._stages = {}
+        self._vertices = {}
+
+    def record(self, endpoint, total, stages, vertices):
+        with self._lock:
+            entry = self._requests.get(endpoint)
+            if entry is None:
+                entry = self._requests[endpoint] = {'count': 0, 'sum': 0.0, 'recent': deque(maxlen=self.window)}
+            entry['count'] += 1
+            entry['sum'] += total
+            entry['recent'].append(total)
+            for name, duration in stages.items():
+                stage_entry = self._stages.setdefault((endpoint, name), {'count': 0, 'sum': 0.0})
+                stage_entry['count'] += 1
+                stage_entry['sum'] += duration
+            self._vertices[endpoint] = self._vertices.get(endpoint, 0) + vertices
+
+    # Exposition au format texte Prometheus
+    def render(self):
+        lines = [
+            '# TYPE convert_request_duration_seconds summary',
+        ]
+        with self._lock:
+            for endpoint, entry in sorted(self._requests.items()):
+                recent = sorted(entry['recent'])
+                for quantile in (0.5, 0.9, 0.99):
+                    value = recent[min(len(recent) - 1, int(quantile * len(recent)))]
+                    lines.append(f'convert_request_duration_seconds{{endpoint="{endpoint}",quantile="{quantile}"}} {value:.6f}')
+                lines.append(f'convert_request_duration_seconds_sum{{endpoint="{endpoint}"}} {entry["sum"]:.6f}')
+                lines.append(f'convert_request_duration_seconds_count{{endpoint="{endpoint}"}} {entry["count"]}')
+            lines.append('# TYPE convert_stage_duration_seconds summary')
+            for (endpoint, name), entry in sorted(self._stages.items()):
+                labels = f'endpoint="{endpoint}",stage="{name}"'
+                lines.append(f'convert_stage_duration_seconds_sum{{{labels}}} {entry["sum"]:.6f}')
+                lines.append(f'convert_stage_duration_seconds_count{{{labels}}} {entry["count"]}')
+            lines.append('# TYPE convert_vertices_total counter')
+            for endpoint, vertices in sorted(self._vertices.items()):
+                lines.append(f'convert_vertices_total{{endpoint="{endpoint}"}} {vertices}')
+        return '\n'.join(lines) + '\n'
+
+pipeline_metrics = PipelineMetrics(window=METRICS_WINDOW)
+
+@contextmanager
+def stage(name):
+    if not has_request_context():
+        yield
+        return
+    start = time.perf_counter()
     try:
-        # Utiliser le code EPSG pour UTM
-        proj_utm = pyproj.Proj(f"epsg:{epsg_code}")
-        proj_wgs84 = pyproj.Proj(proj="latlong", datum="WGS84")
+        yield
+    finally:
+        timings = g.setdefault('stage_timings', {})
+        timings[name] = timings.get(name, 0.0) + time.perf_counter() - start
 
-        transformer = pyproj.Transformer.from_proj(proj_utm, proj_wgs84, always_xy=True)
+# Nombre de sommets traités pendant la requête, enregistré par le processus
+# web : les workers du pool renvoient leur décompte avec leurs résultats
+def count_request_vertices(n):
+    if has_request_context():
+        g.vertices = g.get('vertices', 0) + n
 
-        project = lambda x, y: transformer.transform(x, y)
-        transformed_geom = transform(project, shape(geometry))
-        
-        # Logging : imprime les coordonnées avant et après transformation
-        logger.debug(f"Avant transformation: {shape(geometry)}")
-        logger.debug(f"Après transformation: {transformed_geom}")
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
 
-        return transformed_geom
-    except Exception as e:
-        logger.error(f"Erreur de conversion UTM à WGS84: {e}")
-        raise
-
-# Fonction pour traiter les données en morceaux
-def process_features_in_chunks(features, epsg_code, chunk_size=100):
-    results = []
-    for i in range(0, len(features), chunk_size):
-        chunk = features[i:i + chunk_size]
-        for feature in chunk:
+# Enregistré avant compress_response : s'exécute après lui et inclut donc
+# l'étape de compression
+@app.after_request
+def add_server_timing(response):
+    timings = g.get('stage_timings', {})
+    parts = [f'{name};dur={duration * 1000:.2f}' for name, duration in timings.items()]
+    if 'request_start' in g:
+        parts.append(f'total;dur={(time.perf_counter() - g.request_start) * 1000:.2f}')
+    if parts:
+        response.headers['Server-Timing'] = ', '.join(parts)
+    return response
+
+# Les réponses en streaming se terminent après after_request : l'agrégation
+# se fait à la fermeture du contexte de requête
+@app.teardown_request
+def record_request_metrics(exc):
+    if 'request_start' not in g or request.endpoint in (None, 'metrics', 'static'):
+        return
+    pipeline_metrics.record(
+        request.endpoint,
+        time.perf_counter() - g.request_start,
+        g.get('stage_timings', {}),
+        g.get('vertices', 0)
+    )
+
+# Configuration du registre de transformateurs (variables d'environnement)
+TARGET_CRS = "EPSG:4326"
+TRANSFORMER_CACHE_SIZE = int(os.environ.get("TRANSFORMER_CACHE_SIZE", "256"))
+TRANSFORMER_WARMUP_EPSG = os.environ.get("TRANSFORMER_WARMUP_EPSG", "32601-32660,32701-32760")
+
+# Configuration du mode streaming
+STREAM_MAX_BATCH_SIZE = int(os.environ.get("STREAM_MAX_BATCH_SIZE", "1000"))
+STREAM_READ_SIZE = int(os.environ.get("STREAM_READ_SIZE", "65536"))
+STREAM_MAX_FEATURE_SIZE = int(os.environ.get("STREAM_MAX_FEATURE_SIZE", str(64 * 1024 ** 2)))
+
+# Configuration du traitement parallèle. Le pool est facultatif : chaque
+# worker gunicorn lance ses propres processus (environ 85 Mo chacun), donc
+# PARALLEL_WORKERS vaut 0 (désactivé) par défaut ; "auto" prend le nombre de
+# cœurs réellement attribués au processus, et non ceux de l'hôte.
+def available_cpus():
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+PARALLEL_WORKERS = os.environ.get("PARALLEL_WORKERS", "0")
+PARALLEL_WORKERS = available_cpus() if PARALLEL_WORKERS == 'auto' else int(PARALLEL_WORKERS)
+PARALLEL_MIN_FEATURES = int(os.environ.get("PARALLEL_MIN_FEATURES", "5000"))
+PARALLEL_MIN_VERTICES = int(os.environ.get("PARALLEL_MIN_VERTICES", "200000"))
+PARALLEL_CHUNK_SIZE = int(os.environ.get("PARALLEL_CHUNK_SIZE", "1000"))
+
+# Registre de transformateurs pyproj partagé par le processus, avec éviction LRU.
+# Les objets Transformer de pyproj (>= 3.1) peuvent être partagés entre threads ;
+# le verrou ne protège que la structure du cache et les compteurs. Un code EPSG
+# invalide est mémorisé avec son erreur pour ne pas refaire la recherche dans la
+# base CRS à chaque appel, dans un petit cache séparé : des codes invalides
+# variés ne peuvent pas évincer les transformateurs préchargés.
+class TransformerRegistry:
+    def __init__(self, maxsize=256, failure_maxsize=64):
+        self.maxsize = maxsize
+        self.failure_maxsize = failure_maxsize
+        self._cache = OrderedDict()
+        self._failures = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, source_epsg, target_crs=TARGET_CRS, always_xy=True):
+        key = (source_epsg, target_crs, always_xy)
+        with self._lock:
+            transformer = self._cache.get(key)
+            if transformer is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return transformer
+            failure = self._failures.get(key)
+            if failure is not None:
+                self._failures.move_to_end(key)
+                self.hits += 1
+                raise pyproj.exceptions.CRSError(failure)
+            self.misses += 1
+
+        # Construction hors verrou : la recherche dans la base CRS est coûteuse
+        try:
+            transformer = pyproj.Transformer.from_crs(f"EPSG:{source_epsg}", target_crs, always_xy=always_xy)
+        except pyproj.exceptions.CRSError as e:
+            with self._lock:
+                self._failures[key] = str(e)
+                while len(self._failures) > self.failure_maxsize:
+                    self._failures.popitem(last=False)
+            raise
+        return self._store(key, transformer)
+
+    def _store(self, key, value):
+        with self._lock:
+            existing = self._cache.get(key)
+            if existing is not None:
+                self._cache.move_to_end(key)
+                return existing
+            self._cache[key] = value
+            while len(self._cache) > self.maxsize:
+                self._cache.popitem(last=False)
+                self.evictions += 1
+        return value
+
+    def warm_up(self, epsg_codes, target_crs=TARGET_CRS, always_xy=True):
+        loaded = 0
+        for epsg_code in epsg_codes:
             try:
-                geom = convert_utm_to_wgs84(feature['geometry'], epsg_code)
-                results.append({
+                self.get(epsg_code, target_crs, always_xy)
+                loaded += 1
+            except pyproj.exceptions.CRSError as e:
+                logger.warning(f"Préchargement impossible pour EPSG:{epsg_code}: {e}")
+        return loaded
+
+    def stats(self):
+        with self._lock:
+            return {
+                'size': len(self._cache),
+                'maxsize': self.maxsize,
+                'failures': len(self._failures),
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
+
+# Analyse une liste de codes EPSG du type "32601-32660,32701-32760,2154"
+def parse_epsg_ranges(spec):
+    codes = []
+    for part in spec.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        if '-' in part:
+            start, end = part.split('-', 1)
+            codes.extend(range(int(start), int(end) + 1))
+        else:
+            codes.append(int(part))
+    return codes
+
+transformer_registry = TransformerRegistry(maxsize=TRANSFORMER_CACHE_SIZE)
+
+# Préchargement des zones courantes au démarrage
+_warmup_codes = parse_epsg_ranges(TRANSFORMER_WARMUP_EPSG)
+if _warmup_codes:
+    _loaded = transformer_registry.warm_up(_warmup_codes[:TRANSFORMER_CACHE_SIZE])
+    logger.info(f"{_loaded} transformateurs préchargés")
+
+# Transformation vectorisée : toutes les coordonnées d'un tableau de géométries
+# sont extraites en une fois, transformées par un seul appel pyproj sur des
+# tableaux NumPy, puis réécrites avec shapely.set_coordinates.
+# Avec drop_z, la composante Z est retirée en lot avant la transformation ;
+# avec precision, X/Y sont arrondis sur le tableau avant la sérialisation.
+def transform_geometries(geometries, epsg_code, drop_z=False, precision=None):
+    with stage('transform'):
+        return _transform_geometries(geometries, epsg_code, drop_z, precision)
+
+def _transform_geometries(geometries, epsg_code, drop_z, precision):
+    transformer = transformer_registry.get(epsg_code)
+    geometries = np.asarray(geometries, dtype=object)
+    if drop_z:
+        geometries = shapely.force_2d(geometries)
+    result = geometries.copy()
+
+    # Les géométries 3D et 2D sont traitées séparément pour conserver Z
+    has_z = shapely.has_z(geometries)
+    for mask, include_z in ((has_z, True), (~has_z, False)):
+        if not mask.any():
+            continue
+        subset = geometries[mask]
+        coords = shapely.get_coordinates(subset, include_z=include_z)
+        if len(coords):
+            x, y = transformer.transform(coords[:, 0], coords[:, 1])
+            coords[:, 0] = x
+            coords[:, 1] = y
+            if precision is not None:
+                coords[:, :2] = np.round(coords[:, :2], precision)
+        result[mask] = shapely.set_coordinates(subset.copy(), coords)
+    return result
+
+# Erreur de conversion portant la liste des fonctionnalités en échec
+class FeatureConversionError(Exception):
+    def __init__(self, errors):
+        super().__init__(f"{len(errors)} fonctionnalité(s) en échec")
+        self.errors = errors
+
+# Conversions GeoJSON <-> Shapely ; une géométrie nulle (autorisée par la
+# RFC 7946) reste absente et ressort en "geometry": null
+def geometry_from_geojson(geometry):
+    return None if geometry is None else shape(geometry)
+
+def geometry_to_geojson(geom):
+    return None if geom is None else mapping(geom)
+
+# Convertit une seule fonctionnalité GeoJSON
+def convert_feature(feature, epsg_code, drop_z=False, precision=None):
+    geom = transform_geometries([geometry_from_geojson(feature['geometry'])], epsg_code, drop_z, precision)[0]
+    return {
+        'type': 'Feature',
+        'geometry': geometry_to_geojson(geom),
+        'properties': feature.get('properties')
+    }
+
+# Convertit un morceau de fonctionnalités : toutes les géométries sont
+# regroupées dans un seul tableau Shapely puis transformées en lot. En cas
+# d'échec, le morceau est rejoué fonctionnalité par fonctionnalité pour
+# produire un rapport d'erreurs indexé sur la position d'origine.
+# Renvoie (résultats, erreurs, sommets convertis) ; en rejeu, seules les
+# fonctionnalités converties sont comptées.
+def convert_feature_chunk(features, epsg_code, offset=0, drop_z=False, precision=None):
+    # Un code EPSG invalide fait échouer toute la requête (CRSError), sans rejeu
+    transformer_registry.get(epsg_code)
+    try:
+        with stage('shape'):
+            geometries = np.empty(len(features), dtype=object)
+            for i, feature in enumerate(features):
+                geometries[i] = geometry_from_geojson(feature['geometry'])
+        transformed = transform_geometries(geometries, epsg_code, drop_z, precision)
+        with stage('mapping'):
+            results = [
+                {
                     'type': 'Feature',
-                    'geometry': mapping(geom),
-                    'properties': feature['properties']
-                })
+                    'geometry': geometry_to_geojson(geom),
+                    'properties': feature.get('properties')
+                }
+                for feature, geom in zip(features, transformed)
+            ]
+        return results, [], int(shapely.get_num_coordinates(transformed).sum())
+    except Exception:
+        pass
+
+    results, errors, vertices = [], [], 0
+    for i, feature in enumerate(features):
+        try:
+            converted = convert_feature(feature, epsg_code, drop_z, precision)
+        except Exception as e:
+            errors.append({'index': offset + i, 'error': str(e)})
+            continue
+        results.append(converted)
+        vertices += count_vertices(converted['geometry'])
+    return results, errors, vertices
+
+# Construit le tableau de géométries Shapely d'une liste de fonctionnalités,
+# avec un rapport d'erreurs indexé en cas de géométrie illisible
+def features_to_geometries(features):
+    geometries = np.empty(len(features), dtype=object)
+    errors = []
+    with stage('shape'):
+        for i, feature in enumerate(features):
+            try:
+                geometries[i] = geometry_from_geojson(feature['geometry'])
             except Exception as e:
-                logger.error(f"Erreur lors de la conversion de la fonctionnalité: {e}")
-                raise
+                errors.append({'index': i, 'error': str(e)})
+    if errors:
+        raise FeatureConversionError(errors)
+    return geometries
+
+# Nombre de sommets d'une géométrie GeoJSON, calculé au niveau des anneaux
+# (sans parcourir chaque coordonnée)
+def count_vertices(geometry):
+    if not isinstance(geometry, dict):
+        return 0
+    geom_type = geometry.get('type')
+    coords = geometry.get('coordinates') or []
+    if geom_type == 'Point':
+        return 1
+    if geom_type in ('LineString', 'MultiPoint'):
+        return len(coords)
+    if geom_type in ('Polygon', 'MultiLineString'):
+        return sum(len(ring) for ring in coords)
+    if geom_type == 'MultiPolygon':
+        return sum(len(ring) for polygon in coords for ring in polygon)
+    if geom_type == 'GeometryCollection':
+        return sum(count_vertices(g) for g in geometry.get('geometries', []))
+    return 0
+
+# Pool de processus persistant, activé par PARALLEL_WORKERS > 1 et démarré par
+# le hook post_fork de gunicorn (gunicorn.conf.py), sinon à la première grosse
+# requête. Le démarrage "spawn" réimporte le module dans chaque worker, ce qui
+# précharge son propre registre de transformateurs.
+_process_pool = None
+_process_pool_lock = threading.Lock()
+
+def get_process_pool():
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is None:
+            _process_pool = ProcessPoolExecutor(
+                max_workers=PARALLEL_WORKERS,
+                mp_context=multiprocessing.get_context('spawn')
+            )
+        return _process_pool
+
+def reset_process_pool(wait=False):
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is not None:
+            _process_pool.shutdown(wait=wait, cancel_futures=True)
+            _process_pool = None
+
+def _warm_up_worker():
+    return os.getpid()
+
+# Lance tous les workers dès maintenant pour que la première grosse requête
+# ne paie pas le démarrage et l'import des processus
+def start_process_pool():
+    if PARALLEL_WORKERS <= 1 or not is_main_process():
+        return
+    pool = get_process_pool()
+    for _ in range(PARALLEL_WORKERS):
+        pool.submit(_warm_up_worker)
+
+# Vrai hors des workers "spawn" (pools de conversion et de tâches), qui ne
+# peuvent pas eux-mêmes lancer de processus. Ces workers réimportent ce module
+# avant que parent_process() ne soit renseigné, mais portent déjà leur nom.
+def is_main_process():
+    return multiprocessing.current_process().name == 'MainProcess'
+
+# Les petites requêtes restent dans le processus pour éviter le coût d'IPC ;
+# avec un seul worker, le pool n'apporterait que ce coût
+def should_use_process_pool(features):
+    if PARALLEL_WORKERS <= 1 or len(features) <= PARALLEL_CHUNK_SIZE or not is_main_process():
+        return False
+    if len(features) >= PARALLEL_MIN_FEATURES:
+        return True
+    vertices = 0
+    for feature in features:
+        vertices += count_vertices(feature.get('geometry'))
+        if vertices >= PARALLEL_MIN_VERTICES:
+            return True
+    return False
+
+# Fonction pour traiter les données en morceaux : les morceaux sont envoyés au
+# pool de processus pour les grosses requêtes, puis réassemblés dans l'ordre
+def process_features_in_chunks(features, epsg_code, chunk_size=PARALLEL_CHUNK_SIZE, drop_z=False, precision=None):
+    if not should_use_process_pool(features):
+        results, errors, vertices = convert_feature_chunk(features, epsg_code, drop_z=drop_z, precision=precision)
+    else:
+        # Valider le code EPSG avant d'envoyer les morceaux aux workers
+        transformer_registry.get(epsg_code)
+        pool = get_process_pool()
+        futures = [
+            pool.submit(convert_feature_chunk, features[i:i + chunk_size], epsg_code, i, drop_z, precision)
+            for i in range(0, len(features), chunk_size)
+        ]
+        results, errors, vertices = [], [], 0
+        try:
+            with stage('parallel'):
+                for future in futures:
+                    chunk_results, chunk_errors, chunk_vertices = future.result()
+                    results.extend(chunk_results)
+                    errors.extend(chunk_errors)
+                    vertices += chunk_vertices
+        except BrokenProcessPool:
+            logger.error("Le pool de processus s'est arrêté de façon inattendue.")
+            reset_process_pool()
+            raise
+    count_request_vertices(vertices)
+
+    if errors:
+        logger.error(f"Erreur lors de la conversion de {len(errors)} fonctionnalité(s)")
+        raise FeatureConversionError(errors)
     return results
 
+# Code EPSG WGS84 / UTM d'une zone (1 à 60) et d'un hémisphère ('N' ou 'S')
+def epsg_from_utm_zone(zone, hemisphere='N'):
+    if isinstance(zone, bool) or not isinstance(zone, int) or not 1 <= zone <= 60:
+        raise ValueError(f"utm_zone doit être un entier entre 1 et 60 (reçu: {zone!r}).")
+    hemisphere = (hemisphere or 'N').upper()
+    if hemisphere not in ('N', 'S'):
+        raise ValueError(f"hemisphere doit valoir 'N' ou 'S' (reçu: {hemisphere!r}).")
+    return (32600 if hemisphere == 'N' else 32700) + zone
+
+# CRS source porté par une fonctionnalité : epsg_code, ou utm_zone et
+# hemisphere, en membre de la fonctionnalité. Les propriétés sont des données
+# utilisateur : elles ne sont lues que sur demande explicite (crs_from_properties).
+def read_feature_crs(feature, crs_from_properties=False):
+    sources = [feature]
+    if crs_from_properties:
+        sources.append(feature.get('properties') or {})
+    for source in sources:
+        epsg_code = source.get('epsg_code')
+        if epsg_code is not None:
+            if isinstance(epsg_code, bool) or not isinstance(epsg_code, int):
+                raise ValueError(f"epsg_code doit être un entier (reçu: {epsg_code!r}).")
+            return epsg_code
+        if source.get('utm_zone') is not None:
+            return epsg_from_utm_zone(source['utm_zone'], source.get('hemisphere'))
+    return None
+
+# Paramètre entier facultatif : absent ou vide donne None, une valeur non
+# entière est refusée au lieu d'être ignorée
+def int_param(params, name):
+    value = params.get(name)
+    if value is None or value == '':
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError(f"{name} doit être un entier (reçu: {value!r}).")
+
+# CRS par défaut passé en chaîne de requête ou en formulaire
+def default_epsg_from_params(params):
+    epsg_code = int_param(params, 'epsg_code')
+    if epsg_code is None and params.get('utm_zone'):
+        epsg_code = epsg_from_utm_zone(int_param(params, 'utm_zone'), params.get('hemisphere'))
+    if epsg_code is not None:
+        transformer_registry.get(epsg_code)
+    return epsg_code
+
+# Première coordonnée d'une géométrie GeoJSON, pour la détection du CRS
+def first_coordinate(geometry):
+    if geometry.get('type') == 'GeometryCollection':
+        for child in geometry.get('geometries', []):
+            coord = first_coordinate(child)
+            if coord is not None:
+                return coord
+        return None
+    coords = geometry.get('coordinates')
+    while isinstance(coords, list) and coords and isinstance(coords[0], list):
+        coords = coords[0]
+    return coords if coords else None
+
+# Détection d'après les plages de coordonnées : des degrés sont déjà en WGS84,
+# des valeurs métriques compatibles UTM prennent le CRS par défaut
+def detect_feature_crs(feature, default_epsg):
+    coord = first_coordinate(feature.get('geometry') or {})
+    if coord is None:
+        return default_epsg
+    return detect_coordinate_crs(coord[0], coord[1], default_epsg)
+
+def detect_coordinate_crs(x, y, default_epsg):
+    if -180 <= x <= 180 and -90 <= y <= 90:
+        return 4326
+    if 100000 <= x <= 900000 and -10000 <= y <= 10000000:
+        if default_epsg is None:
+            raise ValueError("Coordonnées UTM détectées mais zone UTM inconnue.")
+        return default_epsg
+    raise ValueError(f"CRS source non détecté pour les coordonnées ({x}, {y}).")
+
+MISSING_CRS_ERROR = "Aucun CRS source: epsg_code ou utm_zone est requis."
+
+# CRS source de chaque fonctionnalité, avec rapport d'erreurs indexé. Sans CRS
+# par défaut ni aucune indication par fonctionnalité, une seule erreur est levée.
+def resolve_feature_crs(features, default_epsg, detect_crs=False, crs_from_properties=False):
+    epsg_codes = []
+    errors = []
+    missing = 0
+    for i, feature in enumerate(features):
+        try:
+            epsg_code = read_feature_crs(feature, crs_from_properties)
+            if epsg_code is None:
+                epsg_code = detect_feature_crs(feature, default_epsg) if detect_crs else default_epsg
+            if epsg_code is None and feature.get('geometry') is None:
+                # Rien à transformer : n'importe quel CRS convient
+                epsg_code = 4326
+            if epsg_code is None:
+                missing += 1
+                raise ValueError(MISSING_CRS_ERROR)
+        except (AttributeError, TypeError, ValueError) as e:
+            errors.append({'index': i, 'error': str(e)})
+            epsg_code = None
+        epsg_codes.append(epsg_code)
+    if missing and missing == len(features):
+        raise ValueError(MISSING_CRS_ERROR)
+    if errors:
+        raise FeatureConversionError(errors)
+    return epsg_codes
+
+# Regroupe les index des fonctionnalités par CRS source, dans l'ordre d'entrée
+def group_by_crs(epsg_codes):
+    groups = {}
+    for i, epsg_code in enumerate(epsg_codes):
+        groups.setdefault(epsg_code, []).append(i)
+    return groups
+
+# Conversion d'une collection multi-CRS : chaque groupe est transformé en un
+# seul lot avec son transformateur en cache, puis les résultats sont remis
+# dans l'ordre d'entrée
+def process_features_by_crs(features, default_epsg, detect_crs=False, drop_z=False, precision=None, crs_from_properties=False):
+    epsg_codes = resolve_feature_crs(features, default_epsg, detect_crs, crs_from_properties)
+    groups = group_by_crs(epsg_codes)
+    if len(groups) == 1:
+        return process_features_in_chunks(features, epsg_codes[0], drop_z=drop_z, precision=precision)
+
+    results = [None] * len(features)
+    errors = []
+    for epsg_code, indices in groups.items():
+        try:
+            converted = process_features_in_chunks(
+                [features[i] for i in indices], epsg_code, drop_z=drop_z, precision=precision
+            )
+        except FeatureConversionError as e:
+            errors.extend({'index': indices[error['index']], 'error': error['error']} for error in e.errors)
+            continue
+        for i, feature in zip(indices, converted):
+            results[i] = feature
+    if errors:
+        raise FeatureConversionError(sorted(errors, key=lambda error: error['index']))
+    return results
+
+# CRS source de chaque géométrie d'un lot WKB : SRID EWKB s'il est présent,
+# sinon détection ou CRS par défaut. Les géométries absentes n'ont pas de CRS.
+def resolve_geometry_crs(geometries, default_epsg, detect_crs=False):
+    srids = shapely.get_srid(geometries)
+    missing = shapely.is_missing(geometries)
+    epsg_codes = []
+    errors = []
+    for i, geom in enumerate(geometries):
+        epsg_code = None
+        if missing[i]:
+            pass
+        elif srids[i] > 0:
+            epsg_code = int(srids[i])
+        elif detect_crs and not geom.is_empty:
+            try:
+                x, y = shapely.get_coordinates(geom)[0]
+                epsg_code = detect_coordinate_crs(x, y, default_epsg)
+            except ValueError as e:
+                errors.append({'index': i, 'error': str(e)})
+        else:
+            epsg_code = default_epsg
+            if epsg_code is None and geom.is_empty:
+                epsg_code = 4326
+            elif epsg_code is None:
+                errors.append({'index': i, 'error': MISSING_CRS_ERROR})
+        epsg_codes.append(epsg_code)
+    if errors and all(error['error'] == MISSING_CRS_ERROR for error in errors) and not (srids > 0).any():
+        raise ValueError(MISSING_CRS_ERROR)
+    if errors:
+        raise FeatureConversionError(errors)
+    return epsg_codes
+
+# Même regroupement pour un tableau de géométries Shapely (les géométries sans
+# CRS, c'est-à-dire absentes, restent à None)
+def transform_geometries_by_crs(geometries, epsg_codes, drop_z=False, precision=None):
+    result = np.empty(len(geometries), dtype=object)
+    for epsg_code, indices in group_by_crs(epsg_codes).items():
+        if epsg_code is not None:
+            result[indices] = transform_geometries(geometries[indices], epsg_code, drop_z, precision)
+            count_request_vertices(int(shapely.get_num_coordinates(result[indices]).sum()))
+    return result
+
+# Lot WKB : conteneur binaire de géométries WKB/EWKB et de leurs propriétés.
+# Disposition (petit-boutiste) :
+#   b'WKB1' | uint32 nombre | nombre x (uint32 taille + WKB) | uint32 taille + tableau JSON des propriétés
+# Une taille de géométrie nulle représente une géométrie absente.
+_WKB_BATCH_MAGIC = b'WKB1'
+
+def encode_wkb_batch(geometries, properties, srid=None):
+    geometries = np.asarray(geometries, dtype=object)
+    if srid is not None:
+        geometries = shapely.set_srid(geometries, srid)
+    blobs = shapely.to_wkb(geometries, include_srid=srid is not None)
+    parts = [_WKB_BATCH_MAGIC, struct.pack('<I', len(blobs))]
+    for blob in blobs:
+        if blob is None:
+            parts.append(struct.pack('<I', 0))
+        else:
+            parts.append(struct.pack('<I', len(blob)))
+            parts.append(blob)
+    props = json_dumps(list(properties))
+    parts.append(struct.pack('<I', len(props)))
+    parts.append(props)
+    return b''.join(parts)
+
+def decode_wkb_batch(data):
+    view = memoryview(data)
+    if bytes(view[:4]) != _WKB_BATCH_MAGIC:
+        raise ValueError("Lot WKB invalide: en-tête inconnu.")
+    try:
+        (count,) = struct.unpack_from('<I', view, 4)
+        # Chaque géométrie occupe au moins 4 octets : on refuse un nombre
+        # incompatible avec la taille du corps avant toute allocation
+        if count > (len(view) - 12) // 4:
+            raise ValueError(f"Lot WKB invalide: {count} géométries annoncées pour {len(view)} octets.")
+        offset = 8
+        blobs = np.empty(count, dtype=object)
+        for i in range(count):
+            (size,) = struct.unpack_from('<I', view, offset)
+            offset += 4
+            if size:
+                blobs[i] = bytes(view[offset:offset + size])
+                offset += size
+        (size,) = struct.unpack_from('<I', view, offset)
+        properties = json_loads(bytes(view[offset + 4:offset + 4 + size])) if size else [None] * count
+    except struct.error as e:
+        raise ValueError(f"Lot WKB tronqué: {e}")
+    if not isinstance(properties, list) or len(properties) != count:
+        raise ValueError("Lot WKB invalide: nombre de propriétés incohérent.")
+    try:
+        geometries = shapely.from_wkb(blobs)
+    except shapely.errors.GEOSException as e:
+        raise ValueError(f"Lot WKB invalide: géométrie illisible ({e}).")
+    return geometries, properties
+
+# Paramètres booléens passés dans la chaîne de requête
+def query_flag(name):
+    return request.args.get(name, 'false').lower() in ('1', 'true', 'yes')
+
+# Compression gzip des réponses selon Accept-Encoding
+@app.after_request
+def compress_response(response):
+    if (response.direct_passthrough or response.is_streamed
+            or 'Content-Encoding' in response.headers
+            or not request.accept_encodings['gzip']):
+        return response
+    data = response.get_data()
+    if len(data) < GZIP_MIN_SIZE:
+        return response
+    with stage('compress'):
+        response.set_data(gzip.compress(data, compresslevel=GZIP_LEVEL))
+    response.headers['Content-Encoding'] = 'gzip'
+    response.vary.add('Accept-Encoding')
+    return response
+
 @app.route('/convert', methods=['POST'])
 def convert():
     try:
-        data = request.get_json()
+        output_format = request.accept_mimetypes.best_match(
+            ['application/json', WKB_BATCH_MIMETYPE], default='application/json'
+        )
+
+        # Entrée binaire : lot WKB/EWKB, paramètres dans la chaîne de requête
+        if request.mimetype == WKB_BATCH_MIMETYPE:
+            with stage('parse'):
+                geometries, properties = decode_wkb_batch(read_request_body())
+            epsg_code = default_epsg_from_params(request.args)
+            drop_z = query_flag('drop_z')
+            precision = get_precision(request.args.get('precision'))
+            if not len(geometries):
+                logger.warning("Aucune géométrie trouvée dans le lot WKB.")
+                return jsonify({"error": "Aucune géométrie trouvée dans le lot WKB."}), 400
+
+            # CRS par géométrie : SRID EWKB, sinon epsg_code / utm_zone, ou détection
+            epsg_codes = resolve_geometry_crs(geometries, epsg_code, query_flag('detect_crs'))
+            transformed = transform_geometries_by_crs(geometries, epsg_codes, drop_z, precision)
+            if output_format == WKB_BATCH_MIMETYPE:
+                srid = 4326 if query_flag('ewkb') else None
+                with stage('serialize'):
+                    body = encode_wkb_batch(transformed, properties, srid)
+                return Response(body, mimetype=WKB_BATCH_MIMETYPE)
+            with stage('mapping'):
+                features = [
+                    {
+                        'type': 'Feature',
+                        'geometry': geometry_to_geojson(geom),
+                        'properties': props
+                    }
+                    for geom, props in zip(transformed, properties)
+                ]
+            return render_json({'type': 'FeatureCollection', 'features': features})
+
+        data = parse_request_json()
         epsg_code = data.get('epsg_code')
         geojson = data.get('geojson')
+        drop_z = bool(data.get('drop_z', False))
+        detect_crs = bool(data.get('detect_crs', False))
+        crs_from_properties = bool(data.get('crs_from_properties', False))
+        try:
+            precision = get_precision(data.get('precision'))
+        except (TypeError, ValueError) as e:
+            logger.warning("precision invalide: %s", e)
+            return jsonify({"error": f"precision invalide: {e}"}), 400
 
-        if not epsg_code or not geojson:
-            logger.warning("Données manquantes: epsg_code et geojson sont requis.")
-            return jsonify({"error": "Données manquantes: epsg_code et geojson sont requis."}), 400
+        if not geojson:
+            logger.warning("Données manquantes: geojson est requis.")
+            return jsonify({"error": "Données manquantes: geojson est requis."}), 400
 
-        if not isinstance(epsg_code, int):
+        if epsg_code is not None and (isinstance(epsg_code, bool) or not isinstance(epsg_code, int)):
             logger.warning("epsg_code doit être un entier.")
             return jsonify({"error": "epsg_code doit être un entier."}), 400
 
+        # Zone UTM et hémisphère en alternative à epsg_code
+        if epsg_code is None and data.get('utm_zone') is not None:
+            try:
+                epsg_code = epsg_from_utm_zone(data['utm_zone'], data.get('hemisphere'))
+            except ValueError as e:
+                logger.warning("Zone UTM invalide: %s", e)
+                return jsonify({"error": str(e)}), 400
+
         features = geojson.get('features', [])
         if not features:
             logger.warning("Aucune fonctionnalité trouvée dans le GeoJSON.")
             return jsonify({"error": "Aucune fonctionnalité trouvée dans le GeoJSON."}), 400
 
-        # Traiter les fonctionnalités en morceaux
-        processed_features = process_features_in_chunks(features, epsg_code)
+        # Sortie binaire : les géométries transformées sont encodées directement
+        # en WKB, sans passer par des dictionnaires GeoJSON
+        if output_format == WKB_BATCH_MIMETYPE:
+            epsg_codes = resolve_feature_crs(features, epsg_code, detect_crs, crs_from_properties)
+            geometries = features_to_geometries(features)
+            transformed = transform_geometries_by_crs(geometries, epsg_codes, drop_z, precision)
+            srid = 4326 if data.get('ewkb') else None
+            properties = [feature.get('properties') for feature in features]
+            with stage('serialize'):
+                body = encode_wkb_batch(transformed, properties, srid)
+            return Response(body, mimetype=WKB_BATCH_MIMETYPE)
+
+        # Traiter les fonctionnalités en morceaux, groupées par CRS source
+        processed_features = process_features_by_crs(
+            features, epsg_code, detect_crs, drop_z, precision, crs_from_properties
+        )
 
         result = {
             'type': 'FeatureCollection',
             'features': processed_features
         }
 
-        # Logging : imprime le résultat dans la console
-        logger.debug(f"Résultat: {json.dumps(result, indent=2)}")
+        # Logging : imprime le résultat dans la console (uniquement en DEBUG)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Résultat: %s", json.dumps(result, indent=2))
 
-        return jsonify(result)
+        return render_json(result)
+    except FeatureConversionError as e:
+        return jsonify({"error": f"Erreur lors de la conversion: {e}", "features": e.errors}), 400
+    except pyproj.exceptions.CRSError as e:
+        logger.warning("Code EPSG invalide: %s", e)
+        return jsonify({"error": f"Code EPSG invalide: {e}"}), 400
+    except ValueError as e:
+        logger.warning("Requête invalide: %s", e)
+        return jsonify({"error": f"Requête invalide: {e}"}), 400
     except Exception as e:
         logger.error(f"Erreur lors du traitement de la requête: {e}")
         return jsonify({"error": f"Erreur lors du traitement de la requête: {e}"}), 500
 
-# Nouvelle fonction pour supprimer la composante Z des coordonnées
-def remove_z_from_coordinates(coords):
-    if isinstance(coords[0], list):  # Coordinates like [x, y, z]
-        return [coord[:2] for coord in coords]
+# Lecture incrémentale d'une FeatureCollection : les fonctionnalités du tableau
+# "features" sont décodées une par une sans charger le document entier.
+# Le tampon double à chaque relecture pour rester linéaire sur les gros objets.
+# Une erreur de décodage n'entraîne une relecture que si elle peut venir de la
+# troncature du tampon (chaîne non terminée, ou erreur dans ses derniers
+# caractères) ; une valeur ne peut pas dépasser max_value_size caractères.
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+_TRUNCATION_WINDOW = 64
+
+def _may_be_truncated(error, buf):
+    if error.msg.startswith('Unterminated string'):
+        return True
+    return len(buf) - error.pos <= _TRUNCATION_WINDOW
+
+def iter_collection_features(stream, read_size=STREAM_READ_SIZE, max_value_size=STREAM_MAX_FEATURE_SIZE):
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder('utf-8')()
+    state = {'buf': '', 'pos': 0, 'eof': False}
+
+    def fill():
+        buf = state['buf'][state['pos']:]
+        chunk = stream.read(max(read_size, len(buf)))
+        if not chunk:
+            state['eof'] = True
+            buf += utf8.decode(b'', final=True)
+        else:
+            buf += utf8.decode(chunk)
+        state['buf'], state['pos'] = buf, 0
+
+    def skip_ws():
+        while True:
+            state['pos'] = _WHITESPACE.match(state['buf'], state['pos']).end()
+            if state['pos'] < len(state['buf']):
+                return
+            if state['eof']:
+                raise ValueError("Fin inattendue du document GeoJSON.")
+            fill()
+
+    def next_char(expected):
+        skip_ws()
+        char = state['buf'][state['pos']]
+        if char not in expected:
+            raise ValueError(f"Caractère inattendu '{char}' dans le GeoJSON.")
+        state['pos'] += 1
+        return char
+
+    def refill_value():
+        if len(state['buf']) - state['pos'] > max_value_size:
+            raise ValueError(f"Valeur GeoJSON supérieure à {max_value_size} caractères.")
+        fill()
+
+    def decode_value():
+        skip_ws()
+        while True:
+            try:
+                value, end = decoder.raw_decode(state['buf'], state['pos'])
+            except json.JSONDecodeError as e:
+                if state['eof'] or not _may_be_truncated(e, state['buf']):
+                    raise
+                refill_value()
+                continue
+            # Une valeur qui touche la fin du tampon peut être tronquée (nombre)
+            if end == len(state['buf']) and not state['eof']:
+                refill_value()
+                continue
+            state['pos'] = end
+            return value
+
+    next_char('{')
+    skip_ws()
+    if state['buf'][state['pos']] == '}':
+        return
+    while True:
+        key = decode_value()
+        next_char(':')
+        if key == 'features':
+            next_char('[')
+            skip_ws()
+            if state['buf'][state['pos']] == ']':
+                state['pos'] += 1
+            else:
+                while True:
+                    yield decode_value()
+                    if next_char(',]') == ']':
+                        break
+        else:
+            decode_value()
+        if next_char(',}') == '}':
+            return
+
+# Lecture d'un flux GeoJSONSeq (une fonctionnalité par ligne, séparateur RS
+# optionnel). Chaque ligne est lue avec une longueur bornée : un corps sans
+# retour à la ligne n'est jamais chargé en entier.
+def iter_sequence_features(stream, max_line_size=STREAM_MAX_FEATURE_SIZE):
+    while True:
+        line = stream.readline(max_line_size + 1)
+        if not line:
+            return
+        if len(line.rstrip(b'\r\n')) > max_line_size:
+            raise ValueError(f"Ligne GeoJSONSeq trop longue (plus de {max_line_size} octets).")
+        line = line.strip().lstrip(b'\x1e')
+        if line:
+            yield json_loads(line)
+
+# Découpe un itérable de fonctionnalités en lots de taille bornée
+def iter_batches(features, batch_size):
+    features = iter(features)
+    while True:
+        with stage('parse'):
+            batch = list(islice(features, batch_size))
+        if not batch:
+            return
+        yield batch
+
+# Conversion par lots d'un itérable de fonctionnalités. Les index d'erreur
+# sont ramenés à la position d'origine et progress(n) est appelé une fois
+# chaque lot consommé.
+def iter_converted_batches(features, epsg_code, batch_size, drop_z=False, precision=None, progress=None, detect_crs=False,
+                           crs_from_properties=False):
+    done = 0
+    for batch in iter_batches(features, batch_size):
+        try:
+            converted = process_features_by_crs(batch, epsg_code, detect_crs, drop_z, precision, crs_from_properties)
+        except FeatureConversionError as e:
+            raise FeatureConversionError([
+                {'index': done + error['index'], 'error': error['error']} for error in e.errors
+            ])
+        yield converted
+        done += len(batch)
+        if progress is not None:
+            progress(done)
+
+# Erreurs pouvant survenir pendant la lecture ou la conversion d'un flux
+STREAM_ERRORS = (FeatureConversionError, pyproj.exceptions.CRSError, ValueError, OSError, EOFError)
+
+def stream_error_payload(error):
+    payload = {'error': f"Erreur lors de la conversion: {error}"}
+    if isinstance(error, FeatureConversionError):
+        payload['features'] = error.errors
+    return payload
+
+# Rendu des lots convertis. Avec error_record, une erreur en cours de flux
+# (le statut 200 étant déjà envoyé) termine proprement le document : membre
+# "error" de la FeatureCollection, ou dernier enregistrement {"error": ...}
+# en GeoJSONSeq. Sinon l'erreur est propagée.
+def render_converted_batches(batches, output_format, error_record=False):
+    if output_format == 'geojsonseq':
+        try:
+            for batch in batches:
+                with stage('serialize'):
+                    chunk = b''.join(b'\x1e' + json_dumps(feature) + b'\n' for feature in batch)
+                yield chunk
+        except STREAM_ERRORS as e:
+            if not error_record:
+                raise
+            logger.error(f"Erreur lors de la conversion en flux: {e}")
+            yield b'\x1e' + json_dumps(stream_error_payload(e)) + b'\n'
+        return
+
+    yield b'{"type":"FeatureCollection","features":['
+    first = True
+    try:
+        for batch in batches:
+            if not batch:
+                continue
+            with stage('serialize'):
+                chunk = b','.join(json_dumps(feature) for feature in batch)
+            yield chunk if first else b',' + chunk
+            first = False
+    except STREAM_ERRORS as e:
+        if not error_record:
+            raise
+        logger.error(f"Erreur lors de la conversion en flux: {e}")
+        yield b'],"error":' + json_dumps(stream_error_payload(e)) + b'}'
+        return
+    yield b']}'
+
+# Conversion en flux : les lots sont transformés puis émis au fil de l'eau
+def stream_converted_features(features, epsg_code, batch_size, output_format, drop_z=False, precision=None, progress=None,
+                              detect_crs=False, crs_from_properties=False):
+    batches = iter_converted_batches(
+        features, epsg_code, batch_size, drop_z, precision, progress, detect_crs, crs_from_properties
+    )
+    return render_converted_batches(batches, output_format)
+
+# Compression gzip au fil de l'eau d'une réponse en streaming
+def gzip_stream(chunks):
+    compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+# Route de conversion en streaming pour les très gros fichiers.
+# Le corps est la FeatureCollection brute (ou du GeoJSONSeq), epsg_code (ou
+# utm_zone et hemisphere) est passé en paramètre de requête.
+@app.route('/convert_stream', methods=['POST'])
+def convert_stream():
+    batch_size = request.args.get('batch_size', STREAM_MAX_BATCH_SIZE, type=int)
+    batch_size = max(1, min(batch_size, STREAM_MAX_BATCH_SIZE))
+
+    output_format = request.args.get('output', 'geojson')
+    if output_format not in ('geojson', 'geojsonseq'):
+        return jsonify({"error": "output doit valoir 'geojson' ou 'geojsonseq'."}), 400
+
+    drop_z = query_flag('drop_z')
+    try:
+        precision = get_precision(request.args.get('precision'))
+    except ValueError as e:
+        return jsonify({"error": f"precision invalide: {e}"}), 400
+
+    # Valider le CRS par défaut avant de commencer à émettre la réponse ; sans
+    # lui, chaque fonctionnalité doit porter son propre CRS
+    try:
+        epsg_code = default_epsg_from_params(request.args)
+    except (pyproj.exceptions.CRSError, ValueError) as e:
+        logger.warning("CRS source invalide: %s", e)
+        return jsonify({"error": f"CRS source invalide: {e}"}), 400
+    detect_crs = query_flag('detect_crs')
+    crs_from_properties = query_flag('crs_from_properties')
+
+    stream = request.stream
+    if request.content_encoding == 'gzip':
+        stream = gzip.GzipFile(fileobj=stream, mode='rb')
+
+    content_type = request.content_type or ''
+    if 'geo+json-seq' in content_type or 'ndjson' in content_type:
+        features = iter_sequence_features(stream)
     else:
+        features = iter_collection_features(stream)
+
+    # Le premier lot est lu et converti avant d'envoyer le statut : une entrée
+    # illisible ou invalide dès le départ donne encore une vraie erreur 400
+    batches = iter_converted_batches(
+        features, epsg_code, batch_size, drop_z, precision,
+        detect_crs=detect_crs, crs_from_properties=crs_from_properties
+    )
+    try:
+        first_batch = next(batches, None)
+    except STREAM_ERRORS as e:
+        logger.warning("Flux GeoJSON invalide: %s", e)
+        return jsonify(stream_error_payload(e)), 400
+    if first_batch is not None:
+        batches = chain([first_batch], batches)
+
+    mimetype = 'application/geo+json-seq' if output_format == 'geojsonseq' else 'application/geo+json'
+    body = render_converted_batches(batches, output_format, error_record=True)
+    headers = {}
+    if request.accept_encodings['gzip']:
+        body = gzip_stream(body)
+        headers = {'Content-Encoding': 'gzip', 'Vary': 'Accept-Encoding'}
+    return Response(stream_with_context(body), mimetype=mimetype, headers=headers)
+
+# Tâches de conversion asynchrones. Les fichiers d'entrée, de sortie et l'état
+# de chaque tâche sont déposés dans JOBS_DIR/<job_id>, ce qui permet à tout
+# processus gunicorn de répondre aux interrogations d'état. Les tâches
+# s'exécutent dans un pool de processus dédié pour ne pas disputer le GIL aux
+# requêtes /convert interactives.
+_JOB_ID = re.compile(r'^[0-9a-f]{32}$')
+_SEQUENCE_EXTENSIONS = ('.geojsonl', '.geojsons', '.geojsonseq', '.jsonl', '.ndjson')
+_job_pool = None
+_job_pool_lock = threading.Lock()
+_active_jobs = set()
+
+def get_job_pool():
+    global _job_pool
+    with _job_pool_lock:
+        if _job_pool is None:
+            _job_pool = ProcessPoolExecutor(
+                max_workers=JOB_WORKERS,
+                mp_context=multiprocessing.get_context('spawn')
+            )
+            threading.Thread(target=_job_heartbeat_loop, name='convert-job-heartbeat', daemon=True).start()
+        return _job_pool
+
+# Un worker de tâche tué (manque de mémoire, signal) casse tout le pool : il
+# est abandonné pour que la prochaine soumission en recrée un
+def reset_job_pool(broken_pool):
+    global _job_pool
+    with _job_pool_lock:
+        if _job_pool is broken_pool:
+            _job_pool = None
+    broken_pool.shutdown(wait=False, cancel_futures=True)
+
+# Battement de cœur : le processus qui a soumis une tâche touche son fichier
+# "heartbeat" tant qu'elle est en attente ou en cours. Si ce processus
+# disparaît, la tâche est déclarée interrompue (voir is_job_stale). Le même
+# thread purge les tâches terminées depuis plus de JOB_TTL_SECONDS.
+def _job_heartbeat_loop():
+    while True:
+        time.sleep(JOB_HEARTBEAT_SECONDS)
+        with _job_pool_lock:
+            job_ids = list(_active_jobs)
+        for job_id in job_ids:
+            touch_job_heartbeat(job_id)
+        try:
+            sweep_expired_jobs()
+        except OSError as e:
+            logger.warning("Purge des tâches impossible: %s", e)
+
+# Supprime les tâches terminées ou en échec dont l'état n'a pas changé depuis
+# JOB_TTL_SECONDS, ainsi que les répertoires sans état (soumission interrompue)
+def sweep_expired_jobs(now=None):
+    now = time.time() if now is None else now
+    removed = 0
+    try:
+        job_ids = os.listdir(JOBS_DIR)
+    except FileNotFoundError:
+        return 0
+    for job_id in job_ids:
+        path = job_dir(job_id)
+        if path is None:
+            continue
+        status = read_job_status(job_id)
+        if status is None:
+            try:
+                expired = now - os.path.getmtime(path) > JOB_TTL_SECONDS
+            except FileNotFoundError:
+                continue
+        else:
+            expired = status['status'] in ('done', 'failed') and now - status['updated_at'] > JOB_TTL_SECONDS
+        if expired:
+            shutil.rmtree(path, ignore_errors=True)
+            removed += 1
+    if removed:
+        logger.info("%s tâche(s) expirée(s) supprimée(s)", removed)
+    return removed
+
+def touch_job_heartbeat(job_id):
+    try:
+        with open(os.path.join(job_dir(job_id), 'heartbeat'), 'ab'):
+            pass
+        os.utime(os.path.join(job_dir(job_id), 'heartbeat'))
+    except FileNotFoundError:
+        pass
+
+def _finish_active_job(job_id):
+    with _job_pool_lock:
+        _active_jobs.discard(job_id)
+
+# Marque une tâche en échec depuis le processus web (le worker n'a pas pu le faire)
+def fail_job(job_id, message):
+    status = read_job_status(job_id)
+    if status is None or status['status'] not in ('queued', 'running'):
+        return
+    status['status'] = 'failed'
+    status['error'] = message
+    write_job_status(job_id, status)
+
+# Fin d'une tâche vue du processus web : si le worker est mort en cours de
+# route, la tâche est marquée en échec et le pool cassé est abandonné
+def _job_done(job_id, pool, future):
+    _finish_active_job(job_id)
+    if future.cancelled() or not isinstance(future.exception(), BrokenProcessPool):
+        return
+    logger.error("Le worker de la tâche %s s'est arrêté de façon inattendue.", job_id)
+    reset_job_pool(pool)
+    fail_job(job_id, "Tâche interrompue: le worker qui l'exécutait s'est arrêté.")
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+def is_job_stale(job_id, status):
+    if status['status'] not in ('queued', 'running'):
+        return False
+    if status.get('host') == socket.gethostname() and not _pid_alive(status.get('pid', 0)):
+        return True
+    try:
+        heartbeat = os.path.getmtime(os.path.join(job_dir(job_id), 'heartbeat'))
+    except FileNotFoundError:
+        heartbeat = status.get('updated_at', 0)
+    return time.time() - heartbeat > JOB_STALE_SECONDS
+
+def job_dir(job_id):
+    if not _JOB_ID.match(job_id):
+        return None
+    return os.path.join(JOBS_DIR, job_id)
+
+# Lecture de l'état ; une tâche dont le processus propriétaire a disparu est
+# marquée en échec pour pouvoir être supprimée
+def read_job_status(job_id):
+    path = job_dir(job_id)
+    if path is None:
+        return None
+    try:
+        with open(os.path.join(path, 'status.json'), 'rb') as f:
+            status = json_loads(f.read())
+    except FileNotFoundError:
+        return None
+    if is_job_stale(job_id, status):
+        logger.warning("Tâche %s interrompue: processus propriétaire arrêté", job_id)
+        status['status'] = 'failed'
+        status['error'] = "Tâche interrompue: le processus qui l'exécutait s'est arrêté."
+        write_job_status(job_id, status)
+    return status
+
+# Écriture atomique de l'état pour ne jamais exposer un fichier partiel
+def write_job_status(job_id, status):
+    path = os.path.join(job_dir(job_id), 'status.json')
+    status['updated_at'] = time.time()
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(json_dumps(status))
+    os.replace(tmp_path, path)
+
+# Exécutée dans un worker du pool de tâches. Les fonctionnalités sont comptées
+# pendant l'unique passe de conversion ; l'avancement en octets lus donne la
+# progression tant que le total de fonctionnalités n'est pas connu.
+def run_job(job_id, options):
+    status = read_job_status(job_id)
+    path = job_dir(job_id)
+    try:
+        status['status'] = 'running'
+        write_job_status(job_id, status)
+
+        for entry in status['files']:
+            completed = status['features_done']
+            output_format = 'geojsonseq' if entry['sequence'] else 'geojson'
+            with open(os.path.join(path, entry['input']), 'rb') as f:
+
+                def progress(done):
+                    entry['features_done'] = done
+                    entry['bytes_done'] = f.tell()
+                    status['features_done'] = completed + done
+                    status['bytes_done'] = sum(e['bytes_done'] for e in status['files'])
+                    write_job_status(job_id, status)
+
+                features = iter_sequence_features(f) if entry['sequence'] else iter_collection_features(f)
+                with open(os.path.join(path, entry['output']), 'wb') as out:
+                    for chunk in stream_converted_features(
+                        features, options['epsg_code'], JOB_BATCH_SIZE, output_format,
+                        options['drop_z'], options['precision'], progress, options['detect_crs'],
+                        options['crs_from_properties']
+                    ):
+                        out.write(chunk)
+            entry['features_total'] = entry['features_done']
+            entry['bytes_done'] = entry['bytes_total']
+            os.remove(os.path.join(path, entry['input']))
+
+        status['features_total'] = status['features_done']
+        status['bytes_done'] = status['bytes_total']
+        status['status'] = 'done'
+        write_job_status(job_id, status)
+        logger.info("Tâche %s terminée: %s fonctionnalités", job_id, status['features_done'])
+    except Exception as e:
+        logger.error(f"Erreur lors de la tâche {job_id}: {e}")
+        status['status'] = 'failed'
+        status['error'] = str(e)
+        if isinstance(e, FeatureConversionError):
+            status['errors'] = e.errors
+        write_job_status(job_id, status)
+
+# Soumission d'une tâche : un ou plusieurs fichiers GeoJSON (champ "file")
+# et les paramètres de conversion dans le formulaire multipart
+@app.route('/jobs', methods=['POST'])
+def submit_job():
+    files = [f for f in request.files.getlist('file') if f.filename]
+    if not files:
+        logger.warning("Données manquantes: au moins un fichier est requis.")
+        return jsonify({"error": "Données manquantes: au moins un fichier est requis."}), 400
+
+    try:
+        epsg_code = default_epsg_from_params(request.form)
+        precision = get_precision(request.form.get('precision'))
+    except (pyproj.exceptions.CRSError, ValueError) as e:
+        logger.warning("Paramètres invalides: %s", e)
+        return jsonify({"error": f"Paramètres invalides: {e}"}), 400
+
+    job_id = uuid.uuid4().hex
+    path = job_dir(job_id)
+    os.makedirs(path)
+
+    entries = []
+    for i, f in enumerate(files):
+        is_sequence = f.filename.lower().endswith(_SEQUENCE_EXTENSIONS)
+        entry = {
+            'name': f.filename,
+            'input': f'input_{i}',
+            'output': f'output_{i}',
+            'sequence': is_sequence,
+            'features_done': 0,
+            'features_total': None,
+            'bytes_done': 0,
+        }
+        f.save(os.path.join(path, entry['input']))
+        entry['bytes_total'] = os.path.getsize(os.path.join(path, entry['input']))
+        entries.append(entry)
+
+    status = {
+        'job_id': job_id,
+        'status': 'queued',
+        'created_at': time.time(),
+        'features_done': 0,
+        'features_total': None,
+        'bytes_done': 0,
+        'bytes_total': sum(entry['bytes_total'] for entry in entries),
+        'files': entries,
+        'host': socket.gethostname(),
+        'pid': os.getpid(),
+    }
+    write_job_status(job_id, status)
+    touch_job_heartbeat(job_id)
+
+    options = {
+        'epsg_code': epsg_code,
+        'drop_z': request.form.get('drop_z', 'false').lower() in ('1', 'true', 'yes'),
+        'precision': precision,
+        'detect_crs': request.form.get('detect_crs', 'false').lower() in ('1', 'true', 'yes'),
+        'crs_from_properties': request.form.get('crs_from_properties', 'false').lower() in ('1', 'true', 'yes'),
+    }
+    pool = get_job_pool()
+    with _job_pool_lock:
+        _active_jobs.add(job_id)
+    try:
+        future = pool.submit(run_job, job_id, options)
+    except BrokenProcessPool:
+        logger.error("Le pool de tâches s'est arrêté de façon inattendue.")
+        reset_job_pool(pool)
+        _finish_active_job(job_id)
+        fail_job(job_id, "Tâche non démarrée: le pool de tâches s'est arrêté.")
+        return jsonify({"error": "Pool de tâches indisponible, veuillez réessayer.", "job_id": job_id}), 503
+    future.add_done_callback(lambda done: _job_done(job_id, pool, done))
+    logger.info("Tâche %s soumise (%s fichier(s))", job_id, len(entries))
+
+    return jsonify({'job_id': job_id, 'status': 'queued', 'status_url': f'/jobs/{job_id}'}), 202
+
+# État d'avancement d'une tâche
+@app.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    status = read_job_status(job_id)
+    if status is None:
+        return jsonify({"error": "Tâche introuvable."}), 404
+    return jsonify(status)
+
+# Téléchargement du résultat (?file=<index> quand plusieurs fichiers ont été soumis)
+@app.route('/jobs/<job_id>/result', methods=['GET'])
+def job_result(job_id):
+    status = read_job_status(job_id)
+    if status is None:
+        return jsonify({"error": "Tâche introuvable."}), 404
+    if status['status'] != 'done':
+        return jsonify({"error": f"Tâche non terminée (état: {status['status']})."}), 409
+
+    index = request.args.get('file', 0, type=int)
+    if not 0 <= index < len(status['files']):
+        return jsonify({"error": "Index de fichier invalide."}), 400
+
+    entry = status['files'][index]
+    mimetype = 'application/geo+json-seq' if entry['sequence'] else 'application/geo+json'
+    return send_file(
+        os.path.join(job_dir(job_id), entry['output']),
+        mimetype=mimetype,
+        as_attachment=True,
+        download_name=entry['name']
+    )
+
+# Suppression d'une tâche et de ses fichiers
+@app.route('/jobs/<job_id>', methods=['DELETE'])
+def delete_job(job_id):
+    status = read_job_status(job_id)
+    if status is None:
+        return jsonify({"error": "Tâche introuvable."}), 404
+    if status['status'] in ('queued', 'running'):
+        return jsonify({"error": "Tâche en cours, suppression impossible."}), 409
+    shutil.rmtree(job_dir(job_id), ignore_errors=True)
+    return '', 204
+
+# Métriques au format Prometheus : latences par route et par étape, sommets
+# traités et état du registre de transformateurs
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    cache = transformer_registry.stats()
+    lines = [pipeline_metrics.render()]
+    for name in ('hits', 'misses', 'evictions'):
+        lines.append(f'# TYPE convert_transformer_cache_{name}_total counter\n'
+                     f'convert_transformer_cache_{name}_total {cache[name]}\n')
+    lines.append(f'# TYPE convert_transformer_cache_size gauge\nconvert_transformer_cache_size {cache["size"]}\n')
+    return Response(''.join(lines), mimetype='text/plain; version=0.0.4')
+
+# Statistiques du registre de transformateurs (succès/échecs du cache)
+@app.route('/transformer_cache', methods=['GET'])
+def transformer_cache():
+    return jsonify(transformer_registry.stats())
+
+# Réduit des coordonnées GeoJSON imbriquées à X/Y, quelle que soit leur
+# profondeur. Sert de repli pour les coordonnées XYZM que Shapely ne lit pas.
+def remove_z_from_coordinates(coords):
+    if coords and isinstance(coords[0], (int, float)):
         return coords[:2]
+    return [remove_z_from_coordinates(c) for c in coords]
 
-# Nouvelle fonction pour supprimer la composante Z de la géométrie GeoJSON
+# Supprime la composante Z (et M) d'une géométrie GeoJSON, tous types confondus
 def remove_z_from_geometry(geometry):
-   geom_type = geometry['type']
-    coords = geometry['coordinates']
-
-    if geom_type == 'Point':
-        geometry['coordinates'] = remove_z_from_coordinates(coords)
-    elif geom_type == 'LineString' or geom_type == 'MultiLineString':
-        if geom_type == 'MultiLineString':
-            geometry['coordinates'] = [remove_z_from_coordinates(line) for line in coords]
+    try:
+        return mapping(shapely.force_2d(shape(geometry)))
+    except ValueError:
+        if geometry['type'] == 'GeometryCollection':
+            geometry['geometries'] = [remove_z_from_geometry(g) for g in geometry['geometries']]
         else:
-            geometry['coordinates'] = remove_z_from_coordinates(coords)
-    elif geom_type == 'Polygon':
-        geometry['coordinates'] = [remove_z_from_coordinates(ring) for ring in coords]
-    elif geom_type == 'MultiPolygon':
-        geometry['coordinates'] = [[remove_z_from_coordinates(ring) for ring in polygon] for polygon in coords]
-    else:
-        raise Exception(f"Type de géométrie non pris en charge: {geom_type}")
+            geometry['coordinates'] = remove_z_from_coordinates(geometry['coordinates'])
+        return geometry
+
+# Supprime la composante Z de toutes les fonctionnalités en un seul appel
+# force_2d sur le tableau de géométries
+def remove_z_from_features(features):
+    geometries = np.empty(len(features), dtype=object)
+    fallback = []
+    for i, feature in enumerate(features):
+        geometry = feature.get('geometry')
+        if geometry is None:
+            continue
+        try:
+            geometries[i] = shape(geometry)
+        except ValueError:
+            fallback.append(i)
 
-    return geometry
+    flattened = shapely.force_2d(geometries)
+    for i, feature in enumerate(features):
+        if flattened[i] is not None:
+            feature['geometry'] = mapping(flattened[i])
+    for i in fallback:
+        features[i]['geometry'] = remove_z_from_geometry(features[i]['geometry'])
+    return features
 
 # Nouvelle route pour supprimer la composante Z des coordonnées dans un GeoJSON
 @app.route('/remove_z', methods=['POST'])
 def remove_z():
     try:
-        data = request.get_json()
+        data = parse_request_json()
         geojson = data.get('geojson')
 
         if not geojson:
             logger.warning("Données manquantes: geojson est requis.")
             return jsonify({"error": "Données manquantes: geojson est requis."}), 400
 
-        for feature in geojson.get('features', []):
-            feature['geometry'] = remove_z_from_geometry(feature['geometry'])
+        remove_z_from_features(geojson.get('features', []))
 
-        return jsonify(geojson)
+        return render_json(geojson)
     except Exception as e:
         logger.error(f"Erreur lors du traitement de la requête: {e}")
         return jsonify({"error": f"Erreur lors du traitement de la requête: {e}"}), 500
@@ -0,0 +1,260 @@
+# Banc d'essai de /convert, exécuté en processus via le client de test Flask
+# (aucun serveur à lancer).
+#
+# Mode par défaut : collections synthétiques (points, longues lignes,
+# multipolygones denses) de 1k à 1M sommets ; débit en sommets/s, latences
+# p50/p99, pic de mémoire résidente (ru_maxrss) et répartition par étape lue
+# dans Server-Timing. Chaque cas s'exécute dans son propre sous-processus :
+# ru_maxrss étant un maximum sur toute la vie du processus, c'est la seule
+# façon d'obtenir le pic d'un cas donné. La hausse du pic pendant les requêtes
+# (au-delà de la construction du jeu de données) est donnée à part, ainsi que
+# le pic des workers du pool, connu après leur arrêt.
+# Le p99 n'est calculé qu'à partir de 100 répétitions.
+# Mode --formats : taille des charges utiles et temps d'aller-retour en
+# GeoJSON et en lot WKB, avec et sans compression gzip.
+#
+# Utilisation :
+#   python benchmark.py --sizes 1000,10000,100000 --repeat 100 --json bench.json
+#   python benchmark.py --formats --features 2000 --vertices 50
+import argparse
+import gzip
+import json
+import math
+import resource
+import subprocess
+import sys
+import time
+
+from shapely.geometry import shape
+
+from app import app, count_vertices, encode_wkb_batch, reset_process_pool, WKB_BATCH_MIMETYPE
+
+EPSG_CODE = 32633
+
+# FeatureCollection synthétique de lignes en UTM 33N
+def make_linestrings(n_features, n_vertices):
+    return {
+        'type': 'FeatureCollection',
+        'features': [
+            {
+                'type': 'Feature',
+                'geometry': {
+                    'type': 'LineString',
+                    'coordinates': [[500000.0 + i * 10.5 + j, 4649776.0 + j * 3.25, 100.0 + j] for j in range(n_vertices)]
+                },
+                'properties': {'id': i}
+            }
+            for i in range(n_features)
+        ]
+    }
+
+# Points isolés : un sommet par fonctionnalité
+def make_points(n_vertices):
+    return {
+        'type': 'FeatureCollection',
+        'features': [
+            {
+                'type': 'Feature',
+                'geometry': {'type': 'Point', 'coordinates': [500000.0 + (i % 1000) * 7.5, 4649776.0 + (i // 1000) * 7.5]},
+                'properties': {'id': i}
+            }
+            for i in range(n_vertices)
+        ]
+    }
+
+# Anneau fermé de n sommets autour d'un centre
+def make_ring(cx, cy, radius, n):
+    ring = [
+        [cx + radius * math.cos(2 * math.pi * k / (n - 1)), cy + radius * math.sin(2 * math.pi * k / (n - 1))]
+        for k in range(n - 1)
+    ]
+    ring.append(ring[0])
+    return ring
+
+# Multipolygones denses : 4 polygones de 250 sommets par fonctionnalité
+def make_multipolygons(n_vertices, parts=4, ring_size=250):
+    n_features = max(1, n_vertices // (parts * ring_size))
+    return {
+        'type': 'FeatureCollection',
+        'features': [
+            {
+                'type': 'Feature',
+                'geometry': {
+                    'type': 'MultiPolygon',
+                    'coordinates': [
+                        [make_ring(500000.0 + i * 50.0 + p * 10.0, 4649776.0 + p * 10.0, 4.0, ring_size)]
+                        for p in range(parts)
+                    ]
+                },
+                'properties': {'id': i}
+            }
+            for i in range(n_features)
+        ]
+    }
+
+DATASETS = {
+    'points': make_points,
+    'linestrings': lambda n_vertices: make_linestrings(max(1, n_vertices // 1000), min(n_vertices, 1000)),
+    'multipolygons': make_multipolygons,
+}
+
+# ru_maxrss est exprimé en Ko sous Linux
+def peak_rss_mb(who=resource.RUSAGE_SELF):
+    return resource.getrusage(who).ru_maxrss / 1024
+
+# Nombre minimal de mesures pour qu'un p99 ait un sens
+P99_MIN_SAMPLES = 100
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+def parse_server_timing(header):
+    stages = {}
+    for part in header.split(','):
+        name, _, duration = part.strip().partition(';dur=')
+        if duration:
+            stages[name] = float(duration)
+    return stages
+
+# Exécute une requête /convert et renvoie (durée, étapes Server-Timing)
+def run_convert(client, body):
+    start = time.perf_counter()
+    response = client.post('/convert', data=body, content_type='application/json')
+    elapsed = time.perf_counter() - start
+    if response.status_code != 200:
+        raise RuntimeError(f"statut {response.status_code}: {response.get_data(as_text=True)[:200]}")
+    return elapsed, parse_server_timing(response.headers.get('Server-Timing', ''))
+
+def bench_pipeline(dataset, n_vertices, repeat):
+    fc = DATASETS[dataset](n_vertices)
+    vertices = sum(count_vertices(f['geometry']) for f in fc['features'])
+    body = json.dumps({'epsg_code': EPSG_CODE, 'geojson': fc}).encode('utf-8')
+    client = app.test_client()
+    baseline_rss = peak_rss_mb()
+
+    # Requête de chauffe, puis mesures
+    run_convert(client, body)
+    timings, stages = [], {}
+    for _ in range(repeat):
+        elapsed, request_stages = run_convert(client, body)
+        timings.append(elapsed)
+        for name, duration in request_stages.items():
+            stages.setdefault(name, []).append(duration)
+
+    p50 = percentile(timings, 0.5)
+    return {
+        'dataset': dataset,
+        'features': len(fc['features']),
+        'vertices': vertices,
+        'request_bytes': len(body),
+        'p50_ms': p50 * 1000,
+        'p99_ms': percentile(timings, 0.99) * 1000 if len(timings) >= P99_MIN_SAMPLES else None,
+        'vertices_per_s': vertices / p50,
+        'peak_rss_mb': peak_rss_mb(),
+        'request_rss_mb': peak_rss_mb() - baseline_rss,
+        'stages_ms': {name: percentile(values, 0.5) for name, values in stages.items()},
+    }
+
+def build_requests(fc):
+    geojson_body = json.dumps({'epsg_code': EPSG_CODE, 'geojson': fc}).encode('utf-8')
+    geometries = [shape(f['geometry']) for f in fc['features']]
+    properties = [f['properties'] for f in fc['features']]
+    wkb_body = encode_wkb_batch(geometries, properties)
+
+    json_in = {'path': '/convert', 'content_type': 'application/json'}
+    wkb_in = {'path': f'/convert?epsg_code={EPSG_CODE}', 'content_type': WKB_BATCH_MIMETYPE}
+    return [
+        ('geojson', geojson_body, json_in, {}),
+        ('geojson+gzip', gzip.compress(geojson_body), json_in,
+         {'Content-Encoding': 'gzip', 'Accept-Encoding': 'gzip'}),
+        ('wkb', wkb_body, wkb_in, {'Accept': WKB_BATCH_MIMETYPE}),
+        ('wkb+gzip', gzip.compress(wkb_body), wkb_in,
+         {'Content-Encoding': 'gzip', 'Accept-Encoding': 'gzip', 'Accept': WKB_BATCH_MIMETYPE}),
+    ]
+
+def bench_formats(fc, repeat):
+    client = app.test_client()
+    rows = []
+    for name, body, target, headers in build_requests(fc):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            response = client.post(target['path'], data=body, content_type=target['content_type'], headers=headers)
+            timings.append(time.perf_counter() - start)
+            if response.status_code != 200:
+                raise RuntimeError(f"{name}: statut {response.status_code}: {response.get_data(as_text=True)[:200]}")
+        rows.append((name, len(body), len(response.get_data()), min(timings)))
+    return rows
+
+# Exécute un cas dans un processus neuf et renvoie sa ligne de résultats
+def bench_pipeline_subprocess(dataset, n_vertices, repeat):
+    completed = subprocess.run(
+        [sys.executable, __file__, '--case', f'{dataset}:{n_vertices}', '--repeat', str(repeat)],
+        stdout=subprocess.PIPE, check=True, text=True
+    )
+    return json.loads(completed.stdout.splitlines()[-1])
+
+# Point d'entrée d'un cas (--case) : la ligne JSON est lue par le processus parent
+def run_case(case, repeat):
+    dataset, _, size = case.partition(':')
+    row = bench_pipeline(dataset, int(size), repeat)
+    # Arrêt du pool pour que ru_maxrss des processus enfants couvre ses workers
+    reset_process_pool(wait=True)
+    row['workers_peak_rss_mb'] = peak_rss_mb(resource.RUSAGE_CHILDREN)
+    print(json.dumps(row))
+
+def print_pipeline(rows):
+    print(f"{'jeu':<14}{'sommets':>10}{'p50 (ms)':>11}{'p99 (ms)':>11}{'sommets/s':>13}"
+          f"{'pic RSS (Mo)':>14}{'requêtes (Mo)':>15}{'workers (Mo)':>14}  étapes p50 (ms)")
+    for row in rows:
+        stages = ' '.join(f"{name}={duration:.1f}" for name, duration in row['stages_ms'].items() if name != 'total')
+        p99 = f"{row['p99_ms']:.1f}" if row['p99_ms'] is not None else '-'
+        print(f"{row['dataset']:<14}{row['vertices']:>10}{row['p50_ms']:>11.1f}{p99:>11}"
+              f"{row['vertices_per_s']:>13.0f}{row['peak_rss_mb']:>14.1f}{row['request_rss_mb']:>15.1f}"
+              f"{row['workers_peak_rss_mb']:>14.1f}  {stages}")
+
+def print_formats(rows):
+    print(f"{'format':<14}{'requête (o)':>14}{'réponse (o)':>14}{'temps (ms)':>12}")
+    for name, request_size, response_size, elapsed in rows:
+        print(f"{name:<14}{request_size:>14}{response_size:>14}{elapsed * 1000:>12.1f}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Banc d'essai de /convert")
+    parser.add_argument('--formats', action='store_true', help="compare les formats de transport")
+    parser.add_argument('--sizes', default='1000,10000,100000,1000000', help="nombres de sommets, séparés par des virgules")
+    parser.add_argument('--datasets', default=','.join(DATASETS), help="jeux synthétiques, séparés par des virgules")
+    parser.add_argument('--features', type=int, default=2000, help="(--formats) nombre de fonctionnalités")
+    parser.add_argument('--vertices', type=int, default=50, help="(--formats) sommets par fonctionnalité")
+    parser.add_argument('--repeat', type=int, default=P99_MIN_SAMPLES,
+                        help=f"mesures par cas (p99 calculé à partir de {P99_MIN_SAMPLES})")
+    parser.add_argument('--case', help=argparse.SUPPRESS)
+    parser.add_argument('--json', help="écrit les résultats dans ce fichier JSON")
+    args = parser.parse_args()
+
+    if args.case:
+        run_case(args.case, args.repeat)
+        return
+
+    if args.formats:
+        fc = make_linestrings(args.features, args.vertices)
+        print(f"{args.features} fonctionnalités x {args.vertices} sommets")
+        rows = bench_formats(fc, args.repeat)
+        print_formats(rows)
+        results = [
+            {'format': name, 'request_bytes': request_size, 'response_bytes': response_size, 'ms': elapsed * 1000}
+            for name, request_size, response_size, elapsed in rows
+        ]
+    else:
+        results = []
+        for size in (int(value) for value in args.sizes.split(',')):
+            for dataset in args.datasets.split(','):
+                results.append(bench_pipeline_subprocess(dataset, size, args.repeat))
+        print_pipeline(results)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'timestamp': time.time(), 'results': results}, f, indent=2)
+
+if __name__ == '__main__':
+    main()
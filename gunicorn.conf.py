@@ -0,0 +1,11 @@
+# Configuration gunicorn (chargée par le Procfile)
+worker_class = 'gthread'
+threads = 4
+timeout = 120
+
+
+# Fonction pour démarrer le pool de conversion dans chaque worker après le
+# fork, plutôt qu'à l'import du module (pytest, benchmark.py, etc.)
+def post_fork(server, worker):
+    from app import start_process_pool
+    start_process_pool()
@@ -0,0 +1,27 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app  # noqa: E402
+
+
+# Fonctionnalité Point en UTM 33N, décalée de i mètres
+def make_point(i, **properties):
+    return {
+        'type': 'Feature',
+        'geometry': {'type': 'Point', 'coordinates': [500000.0 + i, 4649776.25 - i * 1e-3]},
+        'properties': dict(properties, i=i),
+    }
+
+
+@pytest.fixture
+def point():
+    return make_point
+
+
+@pytest.fixture
+def client():
+    return app.app.test_client()
@@ -0,0 +1,61 @@
+import json
+
+import pytest
+
+import app
+
+BIG = 123456789012345678901234567890
+
+
+@pytest.fixture(params=['orjson', 'json'])
+def codec(request, monkeypatch):
+    if request.param == 'orjson':
+        if app.orjson is None:
+            pytest.skip('orjson non installé')
+    else:
+        monkeypatch.setattr(app, 'orjson', None)
+    return request.param
+
+
+def test_codecs_round_trip_the_same_values(codec):
+    document = {'name': 'é€𝄞', 'big': BIG, 'negative': -2 ** 63 - 1, 'max': 2 ** 64 - 1,
+                'float': 4649776.123456789, 'list': [1, None, True], 'nested': {'a': []}}
+    data = app.json_dumps(document)
+    assert isinstance(data, bytes)
+    assert app.json_loads(data) == document
+    assert app.json_loads(json.dumps(document).encode()) == document
+    assert type(app.json_loads(b'{"big": %d}' % BIG)['big']) is int
+
+
+def test_codecs_reject_nan(codec):
+    with pytest.raises(ValueError):
+        app.json_loads(b'[NaN]')
+
+
+def test_convert_keeps_wide_integer_properties(client, point, codec):
+    feature = point(0)
+    feature['properties']['id'] = BIG
+    body = json.dumps({'epsg_code': 32633, 'geojson': {'features': [feature]}})
+    response = client.post('/convert', data=body, content_type='application/json')
+    assert json.loads(response.data)['features'][0]['properties']['id'] == BIG
+
+
+@pytest.mark.parametrize('value, expected', [(None, app.COORDINATE_PRECISION), ('', app.COORDINATE_PRECISION),
+                                             (0, 0), ('6', 6), (15, 15)])
+def test_precision_values(value, expected):
+    assert app.get_precision(value) == expected
+
+
+@pytest.mark.parametrize('value', [-1, 16, 'abc', 2.5])
+def test_precision_out_of_range_is_400(client, point, value):
+    response = client.post('/convert', json={'epsg_code': 32633, 'precision': value, 'geojson': {'features': [point(0)]}})
+    assert response.status_code == 400
+
+
+def test_precision_rounds_only_x_and_y(client):
+    feature = {'type': 'Feature', 'properties': {}, 'geometry': {
+        'type': 'Point', 'coordinates': [500000.0, 4649776.0, 12.3456789]}}
+    response = client.post('/convert', json={'epsg_code': 32633, 'precision': 3, 'geojson': {'features': [feature]}})
+    lon, lat, z = response.get_json()['features'][0]['geometry']['coordinates']
+    assert lon == round(lon, 3) and lat == round(lat, 3)
+    assert z == 12.3456789
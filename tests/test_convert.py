@@ -0,0 +1,176 @@
+import io
+import json
+
+import pyproj
+import pytest
+from shapely.geometry import shape
+
+import app
+
+
+def test_invalid_epsg_fails_once(client, point, monkeypatch):
+    registry = app.TransformerRegistry()
+    monkeypatch.setattr(app, 'transformer_registry', registry)
+    features = [point(i) for i in range(3000)]
+    for _ in range(2):
+        response = client.post('/convert', json={'epsg_code': 99999, 'geojson': {'features': features}})
+        assert response.status_code == 400
+        assert 'features' not in response.get_json()
+    assert registry.stats()['misses'] == 1
+
+
+def test_geometry_errors_are_reported_per_feature(client, point):
+    features = [point(i) for i in range(10)]
+    features[3]['geometry'] = {'type': 'Bad'}
+    response = client.post('/convert', json={'epsg_code': 32633, 'geojson': {'features': features}})
+    assert response.status_code == 400
+    assert [error['index'] for error in response.get_json()['features']] == [3]
+
+
+def wkb_body(point, srid=None):
+    geometries = [shape(point(i)['geometry']) for i in range(3)] + [None]
+    return app.encode_wkb_batch(geometries, [{'i': i} for i in range(4)], srid=srid)
+
+
+def test_wkb_batch_rejects_oversized_count(client):
+    response = client.post('/convert?epsg_code=32633', data=b'WKB1\xff\xff\xff\xff\x00\x00\x00\x00',
+                           content_type=app.WKB_BATCH_MIMETYPE)
+    assert response.status_code == 400
+
+
+def test_wkb_batch_crs_parameters(client, point):
+    reference = client.post('/convert?epsg_code=32633', data=wkb_body(point), content_type=app.WKB_BATCH_MIMETYPE)
+    assert reference.status_code == 200
+
+    by_zone = client.post('/convert?utm_zone=33', data=wkb_body(point), content_type=app.WKB_BATCH_MIMETYPE)
+    assert by_zone.get_json() == reference.get_json()
+
+    by_srid = client.post('/convert', data=wkb_body(point, srid=32633), content_type=app.WKB_BATCH_MIMETYPE)
+    assert by_srid.get_json() == reference.get_json()
+    assert reference.get_json()['features'][3]['geometry'] is None
+
+    invalid = client.post('/convert?epsg_code=99999', data=wkb_body(point), content_type=app.WKB_BATCH_MIMETYPE)
+    assert invalid.status_code == 400
+
+
+def test_gzip_refused_with_zero_quality(client, point):
+    features = [point(i) for i in range(200)]
+    payload = {'epsg_code': 32633, 'geojson': {'features': features}}
+    response = client.post('/convert', json=payload, headers={'Accept-Encoding': 'gzip;q=0'})
+    assert 'Content-Encoding' not in response.headers
+    response = client.post('/convert', json=payload, headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+
+
+def test_crs_hints_in_properties_are_ignored_by_default(client, point):
+    features = [point(0), point(1)]
+    features[0]['properties'] = {'utm_zone': '33N'}
+    features[1]['properties'] = {'epsg_code': '2154'}
+    response = client.post('/convert', json={'epsg_code': 32633, 'geojson': {'features': features}})
+    assert response.status_code == 200
+    lon, lat = response.get_json()['features'][1]['geometry']['coordinates']
+    assert abs(lon - 15.0) < 0.01 and abs(lat - 42.0) < 0.1
+
+    response = client.post('/convert', json={
+        'epsg_code': 32633, 'crs_from_properties': True, 'geojson': {'features': features}
+    })
+    assert response.status_code == 400
+
+
+def test_replayed_chunk_counts_converted_vertices_once(point):
+    features = [point(i) for i in range(5)]
+    features[2]['geometry'] = {'type': 'Bad'}
+    results, errors, vertices = app.convert_feature_chunk(features, 32633)
+    assert len(results) == 4
+    assert [error['index'] for error in errors] == [2]
+    assert vertices == 4
+
+    results, errors, vertices = app.convert_feature_chunk(features[:2], 32633)
+    assert vertices == 2 and not errors
+
+
+def test_wkb_batch_rejects_corrupt_geometry(client):
+    blob = b'\x01\x02\x03\x00\x00' + b'\x00' * 16
+    body = b'WKB1' + (1).to_bytes(4, 'little') + len(blob).to_bytes(4, 'little') + blob + b'\x00\x00\x00\x00'
+    response = client.post('/convert?epsg_code=32633', data=body, content_type=app.WKB_BATCH_MIMETYPE)
+    assert response.status_code == 400
+    assert 'WKB' in response.get_json()['error']
+
+
+def test_non_integer_crs_parameters_are_rejected(client, point):
+    body = json.dumps({'type': 'FeatureCollection', 'features': [point(0)]})
+    for query in ('epsg_code=abc', 'utm_zone=abc'):
+        response = client.post(f'/convert_stream?{query}', data=body)
+        assert response.status_code == 400
+        assert 'abc' in response.get_json()['error']
+
+    response = client.post('/jobs', data={'epsg_code': 'abc', 'file': (io.BytesIO(body.encode()), 'a.geojson')})
+    assert response.status_code == 400
+
+
+def test_missing_crs_is_a_single_error(client, point):
+    features = [point(i) for i in range(1000)]
+    response = client.post('/convert', json={'geojson': {'features': features}})
+    assert response.status_code == 400
+    assert 'features' not in response.get_json()
+
+    features[1]['epsg_code'] = 32633
+    response = client.post('/convert', json={'geojson': {'features': features}})
+    assert len(response.get_json()['features']) == 999
+
+
+def test_null_geometries_pass_through(client, point):
+    features = [point(0), {'type': 'Feature', 'geometry': None, 'properties': {'i': 1}}, point(2)]
+    response = client.post('/convert', json={'epsg_code': 32633, 'geojson': {'features': features}})
+    assert response.status_code == 200
+    converted = response.get_json()['features']
+    assert converted[1] == {'type': 'Feature', 'geometry': None, 'properties': {'i': 1}}
+    assert converted[2]['geometry']['type'] == 'Point'
+
+    body = json.dumps({'type': 'FeatureCollection', 'features': features})
+    response = client.post('/convert_stream?epsg_code=32633', data=body)
+    assert response.status_code == 200
+    assert json.loads(response.data)['features'][1]['geometry'] is None
+    response = client.post('/convert', json={'geojson': {'features': [{'type': 'Feature', 'geometry': None}]}})
+    assert response.get_json()['features'] == [{'type': 'Feature', 'geometry': None, 'properties': None}]
+
+
+def reference_lonlat(x, y):
+    transformer = pyproj.Transformer.from_crs('EPSG:32633', 'EPSG:4326', always_xy=True)
+    return transformer.transform(x, y)
+
+
+def test_z_is_preserved_through_the_array_path(client):
+    coordinates = [[500000.0, 4649776.0, 12.5], [500100.0, 4649876.0, -3.0]]
+    feature = {'type': 'Feature', 'geometry': {'type': 'LineString', 'coordinates': coordinates}, 'properties': {}}
+    response = client.post('/convert', json={'epsg_code': 32633, 'geojson': {'features': [feature]}})
+    converted = response.get_json()['features'][0]['geometry']['coordinates']
+    for (x, y, z), (lon, lat, z_out) in zip(coordinates, converted):
+        assert (lon, lat) == pytest.approx(reference_lonlat(x, y))
+        assert z_out == z
+
+
+def test_mixed_geometry_types_in_one_call(client, point):
+    features = [
+        point(0),
+        {'type': 'Feature', 'properties': {}, 'geometry': {
+            'type': 'MultiPoint', 'coordinates': [[500000.0, 4649776.0], [501000.0, 4650776.0]]}},
+        {'type': 'Feature', 'properties': {}, 'geometry': {'type': 'GeometryCollection', 'geometries': [
+            {'type': 'Point', 'coordinates': [500000.0, 4649776.0, 7.0]},
+            {'type': 'LineString', 'coordinates': [[500000.0, 4649776.0], [500010.0, 4649786.0]]},
+        ]}},
+        {'type': 'Feature', 'properties': {}, 'geometry': {'type': 'Polygon', 'coordinates': [[
+            [500000.0, 4649776.0, 1.0], [500010.0, 4649776.0, 2.0], [500010.0, 4649786.0, 3.0],
+            [500000.0, 4649776.0, 1.0]]]}},
+    ]
+    response = client.post('/convert', json={'epsg_code': 32633, 'geojson': {'features': features}})
+    assert response.status_code == 200
+    converted = [feature['geometry'] for feature in response.get_json()['features']]
+
+    assert [geometry['type'] for geometry in converted] == ['Point', 'MultiPoint', 'GeometryCollection', 'Polygon']
+    assert converted[1]['coordinates'][1] == pytest.approx(reference_lonlat(501000.0, 4650776.0))
+    point_z, line_2d = converted[2]['geometries']
+    assert len(point_z['coordinates']) == 3 and point_z['coordinates'][2] == 7.0
+    assert all(len(coord) == 2 for coord in line_2d['coordinates'])
+    assert line_2d['coordinates'][1] == pytest.approx(reference_lonlat(500010.0, 4649786.0))
+    assert [coord[2] for coord in converted[3]['coordinates'][0]] == [1.0, 2.0, 3.0, 1.0]
@@ -0,0 +1,98 @@
+import io
+import json
+import time
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+import app
+
+
+def submit(client, features):
+    body = json.dumps({'type': 'FeatureCollection', 'features': features}).encode('utf-8')
+    response = client.post('/jobs', data={'epsg_code': '32633', 'file': (io.BytesIO(body), 'points.geojson')})
+    assert response.status_code == 202
+    return response.get_json()['job_id']
+
+
+def test_job_reports_byte_progress_and_feature_total(client, point):
+    job_id = submit(client, [point(i) for i in range(50)])
+    deadline = time.time() + 60
+    while True:
+        status = client.get(f'/jobs/{job_id}').get_json()
+        if status['status'] not in ('queued', 'running') or time.time() > deadline:
+            break
+        time.sleep(0.1)
+    assert status['status'] == 'done'
+    assert status['features_total'] == status['features_done'] == 50
+    assert status['bytes_done'] == status['bytes_total'] > 0
+
+    result = json.loads(client.get(f'/jobs/{job_id}/result').get_data())
+    assert len(result['features']) == 50
+    assert client.delete(f'/jobs/{job_id}').status_code == 204
+
+
+def test_job_with_dead_owner_is_failed_and_deletable(client):
+    job_id = 'f' * 32
+    app.os.makedirs(app.job_dir(job_id), exist_ok=True)
+    app.write_job_status(job_id, {
+        'job_id': job_id, 'status': 'running', 'created_at': time.time(),
+        'features_done': 0, 'features_total': None, 'files': [],
+        'host': app.socket.gethostname(), 'pid': 2 ** 22 + 1,
+    })
+    app.touch_job_heartbeat(job_id)
+
+    status = client.get(f'/jobs/{job_id}').get_json()
+    assert status['status'] == 'failed'
+    assert client.delete(f'/jobs/{job_id}').status_code == 204
+    assert client.get(f'/jobs/{job_id}').status_code == 404
+
+
+class BrokenPool:
+    def __init__(self, fail_on_submit):
+        self.fail_on_submit = fail_on_submit
+        self.future = Future()
+        self.shut_down = False
+
+    def submit(self, *args):
+        if self.fail_on_submit:
+            raise BrokenProcessPool('worker tué')
+        return self.future
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        self.shut_down = True
+
+
+@pytest.mark.parametrize('fail_on_submit', [True, False])
+def test_broken_job_pool_fails_job_and_is_replaced(client, point, monkeypatch, fail_on_submit):
+    pool = BrokenPool(fail_on_submit)
+    monkeypatch.setattr(app, '_job_pool', pool)
+    body = json.dumps({'type': 'FeatureCollection', 'features': [point(0)]}).encode('utf-8')
+    response = client.post('/jobs', data={'epsg_code': '32633', 'file': (io.BytesIO(body), 'points.geojson')})
+    job_id = response.get_json()['job_id']
+    if fail_on_submit:
+        assert response.status_code == 503
+    else:
+        assert response.status_code == 202
+        pool.future.set_exception(BrokenProcessPool('worker tué'))
+
+    assert job_id not in app._active_jobs
+    assert pool.shut_down and app._job_pool is not pool
+    assert client.get(f'/jobs/{job_id}').get_json()['status'] == 'failed'
+    assert client.delete(f'/jobs/{job_id}').status_code == 204
+
+
+def test_sweep_removes_only_expired_finished_jobs(monkeypatch, tmp_path):
+    monkeypatch.setattr(app, 'JOBS_DIR', str(tmp_path))
+    now = time.time()
+    for job_id, state in (('a' * 32, 'done'), ('b' * 32, 'failed'), ('c' * 32, 'running')):
+        app.os.makedirs(app.job_dir(job_id))
+        app.write_job_status(job_id, {'job_id': job_id, 'status': state, 'files': [],
+                                      'host': app.socket.gethostname(), 'pid': app.os.getpid()})
+        app.touch_job_heartbeat(job_id)
+
+    assert app.sweep_expired_jobs(now) == 0
+    monkeypatch.setattr(app, 'JOB_STALE_SECONDS', float('inf'))
+    assert app.sweep_expired_jobs(now + app.JOB_TTL_SECONDS + 1) == 2
+    assert sorted(app.os.listdir(tmp_path)) == ['c' * 32]
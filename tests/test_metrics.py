@@ -0,0 +1,31 @@
+import app
+
+
+def test_server_timing_lists_pipeline_stages(client, point):
+    response = client.post('/convert', json={'epsg_code': 32633, 'geojson': {'features': [point(0)]}})
+    stages = {}
+    for part in response.headers['Server-Timing'].split(','):
+        name, _, duration = part.strip().partition(';dur=')
+        stages[name] = float(duration)
+    assert {'parse', 'shape', 'transform', 'mapping', 'serialize', 'total'} <= set(stages)
+    assert all(duration >= 0 for duration in stages.values())
+    assert stages['total'] >= stages['transform']
+
+
+def test_metrics_exposes_requests_stages_and_vertices(client, point, monkeypatch):
+    monkeypatch.setattr(app, 'pipeline_metrics', app.PipelineMetrics())
+    features = [point(i) for i in range(3)]
+    features.append({'type': 'Feature', 'properties': {}, 'geometry': {
+        'type': 'LineString', 'coordinates': [[500000.0, 4649776.0], [500010.0, 4649786.0]]}})
+    for _ in range(2):
+        client.post('/convert', json={'epsg_code': 32633, 'geojson': {'features': features}})
+
+    response = client.get('/metrics')
+    assert response.mimetype == 'text/plain'
+    text = response.get_data(as_text=True)
+    assert 'convert_request_duration_seconds_count{endpoint="convert"} 2' in text
+    assert 'convert_request_duration_seconds{endpoint="convert",quantile="0.99"}' in text
+    assert 'convert_stage_duration_seconds_count{endpoint="convert",stage="transform"} 2' in text
+    assert 'convert_vertices_total{endpoint="convert"} 10' in text
+    assert 'endpoint="metrics"' not in text
+    assert 'convert_transformer_cache_hits_total' in text
@@ -0,0 +1,49 @@
+import pyproj
+import pytest
+
+import app
+
+
+def test_hit_and_miss_counters():
+    registry = app.TransformerRegistry(maxsize=4)
+    first = registry.get(32633)
+    assert registry.get(32633) is first
+    assert registry.stats() == {'size': 1, 'maxsize': 4, 'failures': 0, 'hits': 1, 'misses': 1, 'evictions': 0}
+
+
+def test_least_recently_used_is_evicted():
+    registry = app.TransformerRegistry(maxsize=2)
+    registry.get(32631)
+    registry.get(32632)
+    registry.get(32631)
+    registry.get(32633)
+    assert registry.stats()['evictions'] == 1
+
+    misses = registry.stats()['misses']
+    registry.get(32631)
+    assert registry.stats()['misses'] == misses
+    registry.get(32632)
+    assert registry.stats()['misses'] == misses + 1
+
+
+def test_warm_up_loads_valid_codes_only():
+    registry = app.TransformerRegistry(maxsize=8)
+    assert registry.warm_up([32631, 32632, 99999]) == 2
+    stats = registry.stats()
+    assert (stats['size'], stats['failures']) == (2, 1)
+    assert app.parse_epsg_ranges('32601-32603, 2154') == [32601, 32602, 32603, 2154]
+
+
+def test_invalid_codes_do_not_evict_transformers():
+    registry = app.TransformerRegistry(maxsize=2, failure_maxsize=3)
+    registry.warm_up([32631, 32632])
+    for code in range(99990, 100000):
+        with pytest.raises(pyproj.exceptions.CRSError):
+            registry.get(code)
+    stats = registry.stats()
+    assert (stats['size'], stats['evictions'], stats['failures']) == (2, 0, 3)
+
+    misses = stats['misses']
+    with pytest.raises(pyproj.exceptions.CRSError):
+        registry.get(99999)
+    assert registry.stats()['misses'] == misses
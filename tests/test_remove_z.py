@@ -0,0 +1,77 @@
+import json
+
+import pytest
+
+import app
+
+
+def feature(geometry):
+    return {'type': 'Feature', 'geometry': geometry, 'properties': {'name': 'x'}}
+
+
+GEOMETRIES_3D = [
+    ({'type': 'Point', 'coordinates': [1.0, 2.0, 3.0]}, [1.0, 2.0]),
+    ({'type': 'MultiPoint', 'coordinates': [[1.0, 2.0, 3.0], [4.0, 5.0, 6.0]]}, [[1.0, 2.0], [4.0, 5.0]]),
+    ({'type': 'LineString', 'coordinates': [[1.0, 2.0, 3.0], [4.0, 5.0, 6.0]]}, [[1.0, 2.0], [4.0, 5.0]]),
+    ({'type': 'MultiLineString', 'coordinates': [[[1.0, 2.0, 3.0], [4.0, 5.0, 6.0]]]}, [[[1.0, 2.0], [4.0, 5.0]]]),
+    ({'type': 'Polygon', 'coordinates': [[[0.0, 0.0, 1.0], [1.0, 0.0, 1.0], [1.0, 1.0, 1.0], [0.0, 0.0, 1.0]]]},
+     [[[0.0, 0.0], [1.0, 0.0], [1.0, 1.0], [0.0, 0.0]]]),
+    ({'type': 'MultiPolygon', 'coordinates': [[[[0.0, 0.0, 1.0], [1.0, 0.0, 1.0], [1.0, 1.0, 1.0], [0.0, 0.0, 1.0]]]]},
+     [[[[0.0, 0.0], [1.0, 0.0], [1.0, 1.0], [0.0, 0.0]]]]),
+]
+
+
+def as_lists(value):
+    return json.loads(json.dumps(value))
+
+
+@pytest.mark.parametrize('geometry, expected', GEOMETRIES_3D, ids=[g['type'] for g, _ in GEOMETRIES_3D])
+def test_remove_z_all_geometry_types(client, geometry, expected):
+    response = client.post('/remove_z', json={'geojson': {'type': 'FeatureCollection', 'features': [feature(geometry)]}})
+    assert response.status_code == 200
+    result = response.get_json()['features'][0]
+    assert result['geometry'] == {'type': geometry['type'], 'coordinates': expected}
+    assert result['properties'] == {'name': 'x'}
+
+
+def test_remove_z_geometry_collection_and_null(client):
+    collection = {'type': 'GeometryCollection', 'geometries': [
+        {'type': 'Point', 'coordinates': [1.0, 2.0, 3.0]},
+        {'type': 'LineString', 'coordinates': [[1.0, 2.0], [3.0, 4.0]]},
+    ]}
+    features = [feature(collection), feature(None)]
+    response = client.post('/remove_z', json={'geojson': {'type': 'FeatureCollection', 'features': features}})
+    result = response.get_json()['features']
+    assert result[0]['geometry']['geometries'] == [
+        {'type': 'Point', 'coordinates': [1.0, 2.0]},
+        {'type': 'LineString', 'coordinates': [[1.0, 2.0], [3.0, 4.0]]},
+    ]
+    assert result[1]['geometry'] is None
+
+
+def test_remove_z_xyzm_fallback():
+    geometry = {'type': 'GeometryCollection', 'geometries': [
+        {'type': 'Point', 'coordinates': [1.0, 2.0, 3.0, 4.0]},
+        {'type': 'LineString', 'coordinates': [[1.0, 2.0, 3.0, 4.0], [5.0, 6.0, 7.0, 8.0]]},
+    ]}
+    assert as_lists(app.remove_z_from_geometry(geometry))['geometries'] == [
+        {'type': 'Point', 'coordinates': [1.0, 2.0]},
+        {'type': 'LineString', 'coordinates': [[1.0, 2.0], [5.0, 6.0]]},
+    ]
+    assert app.remove_z_from_coordinates([[[1, 2, 3, 4], [5, 6, 7, 8]]]) == [[[1, 2], [5, 6]]]
+
+    features = app.remove_z_from_features([feature({'type': 'Point', 'coordinates': [1.0, 2.0, 3.0, 4.0]})])
+    assert as_lists(features[0]['geometry']) == {'type': 'Point', 'coordinates': [1.0, 2.0]}
+
+
+def test_drop_z_on_convert_and_convert_stream(client):
+    features = [feature({'type': 'LineString', 'coordinates': [[500000.0, 4649776.0, 10.0], [500010.0, 4649786.0, 20.0]]})]
+    response = client.post('/convert', json={'epsg_code': 32633, 'drop_z': True, 'geojson': {'features': features}})
+    assert all(len(coord) == 2 for coord in response.get_json()['features'][0]['geometry']['coordinates'])
+
+    body = json.dumps({'type': 'FeatureCollection', 'features': features})
+    response = client.post('/convert_stream?epsg_code=32633&drop_z=true', data=body)
+    assert all(len(coord) == 2 for coord in json.loads(response.data)['features'][0]['geometry']['coordinates'])
+
+    response = client.post('/convert_stream?epsg_code=32633', data=body)
+    assert [coord[2] for coord in json.loads(response.data)['features'][0]['geometry']['coordinates']] == [10.0, 20.0]
@@ -0,0 +1,114 @@
+import io
+import json
+
+import pytest
+
+import app
+
+
+class CountingStream(io.BytesIO):
+    def __init__(self, data):
+        super().__init__(data)
+        self.bytes_read = 0
+
+    def read(self, size=-1):
+        chunk = super().read(size)
+        self.bytes_read += len(chunk)
+        return chunk
+
+
+def collection(features, **members):
+    return dict({'type': 'FeatureCollection', 'features': features}, **members)
+
+
+def parse(data, **kwargs):
+    return list(app.iter_collection_features(io.BytesIO(data), **kwargs))
+
+
+@pytest.mark.parametrize('read_size', [1, 2, 3, 7, 64, 65536])
+def test_split_reads(read_size, point):
+    features = [point(i) for i in range(50)] + [{'type': 'Feature', 'geometry': None, 'properties': {'n': -1.5e-7}}]
+    data = json.dumps(collection(features, bbox=[1, 2, 3, 4], name='x'), indent=1).encode()
+    assert parse(data, read_size=read_size) == features
+
+
+@pytest.mark.parametrize('read_size', [1, 2, 3, 5])
+def test_multibyte_utf8_across_chunks(read_size, point):
+    features = [point(i, name='é€𝄞 ]}" \\ ' * 3) for i in range(5)]
+    data = json.dumps(collection(features), ensure_ascii=False).encode('utf-8')
+    assert parse(data, read_size=read_size) == features
+
+
+def test_nested_features_keys_are_not_streamed(point):
+    features = [point(0, features=[1, 2]), point(1)]
+    data = json.dumps({
+        'meta': {'features': [{'type': 'Feature'}]},
+        'type': 'FeatureCollection',
+        'features': features,
+        'extra': {'features': []},
+    }).encode()
+    assert parse(data, read_size=3) == features
+
+
+def test_empty_collections():
+    assert parse(b'{}') == []
+    assert parse(b'{"type": "FeatureCollection", "features": []}') == []
+
+
+def test_truncated_input_raises(point):
+    data = json.dumps(collection([point(i, name='é') for i in range(3)])).encode()
+    for end in range(len(data)):
+        with pytest.raises(ValueError):
+            parse(data[:end], read_size=4)
+
+
+def test_syntax_error_does_not_read_whole_stream():
+    data = b'{"type": "FeatureCollection", "features": [{"type": x}' + b' ' * (10 * 1024 ** 2) + b']}'
+    stream = CountingStream(data)
+    with pytest.raises(ValueError):
+        list(app.iter_collection_features(stream, read_size=4096))
+    assert stream.bytes_read < 64 * 1024
+
+
+def test_value_size_is_bounded():
+    data = b'{"features": ["' + b'a' * 100000 + b'"]}'
+    with pytest.raises(ValueError):
+        parse(data, read_size=1024, max_value_size=4096)
+
+
+def test_sequence_line_length_is_bounded(point):
+    line = json.dumps(point(0)).encode()
+    data = b'\x1e' + line + b'\n' + line + b'\r\n'
+    assert list(app.iter_sequence_features(io.BytesIO(data), max_line_size=len(line) + 1)) == [point(0)] * 2
+
+    stream = io.BytesIO(b'{"type": "Feature", "properties": {"a": "' + b'a' * (10 * 1024 ** 2) + b'"}}')
+    with pytest.raises(ValueError):
+        list(app.iter_sequence_features(stream, max_line_size=4096))
+    assert stream.tell() == 4097
+
+
+def test_convert_stream_invalid_first_batch_is_400(client, point):
+    response = client.post('/convert_stream?epsg_code=32633', data=b'{"features": [nope]}')
+    assert response.status_code == 400
+    assert 'error' in response.get_json()
+
+    body = json.dumps(collection([point(0), {'type': 'Feature', 'geometry': {'type': 'Bad'}, 'properties': {}}]))
+    response = client.post('/convert_stream?epsg_code=32633', data=body)
+    assert response.status_code == 400
+    assert [error['index'] for error in response.get_json()['features']] == [1]
+
+
+def test_convert_stream_mid_stream_error_record(client, point):
+    features = [point(i) for i in range(5)] + [{'type': 'Feature', 'geometry': {'type': 'Bad'}, 'properties': {}}]
+    response = client.post('/convert_stream?epsg_code=32633&batch_size=2', data=json.dumps(collection(features)))
+    assert response.status_code == 200
+    document = json.loads(response.data)
+    assert len(document['features']) == 4
+    assert [error['index'] for error in document['error']['features']] == [5]
+
+    seq = b''.join(json.dumps(f).encode() + b'\n' for f in features[:3]) + b'{broken\n'
+    response = client.post('/convert_stream?epsg_code=32633&batch_size=2&output=geojsonseq',
+                           data=seq, content_type='application/geo+json-seq')
+    records = [json.loads(line.lstrip('\x1e')) for line in response.get_data(as_text=True).split('\n') if line]
+    assert len(records) == 3
+    assert 'error' in records[-1]